@@ -0,0 +1,111 @@
+import os
+import time
+import random
+import argparse
+import threading
+
+from ai_metrics import PERCENTILES, percentile
+
+QUESTIONS = [
+    "How can I feel more grateful today?",
+    "What is a simple breathing exercise for stress?",
+    "How do I stop overthinking before sleep?",
+    "Can you suggest a short morning mindfulness routine?",
+    "How do I stay calm in a difficult conversation?",
+]
+
+
+def run_session(session, requests_per_session, think_time, shared_prompts, results, submit):
+    """Ask ``requests_per_session`` questions in a row, like one user on the AI page."""
+    rng = random.Random(session)
+    for number in range(requests_per_session):
+        question = rng.choice(QUESTIONS)
+        prompt = question if shared_prompts else f"{question} (session {session}, question {number})"
+        result = {"session": session, "ttft": None, "latency": None, "tokens": 0, "error": None}
+        started = time.perf_counter()
+        try:
+            for chunk in submit(f"loadtest-{session}", {"model": "standin", "prompt": prompt}):
+                if chunk.get("response"):
+                    if result["ttft"] is None:
+                        result["ttft"] = time.perf_counter() - started
+                    result["tokens"] += 1
+        except Exception as e:
+            result["error"] = type(e).__name__
+        result["latency"] = time.perf_counter() - started
+        results.append(result)
+        time.sleep(rng.uniform(0, think_time * 2))  # Reading the answer before asking again
+
+
+def report(results, elapsed):
+    ok = [result for result in results if result["error"] is None]
+    errors = {}
+    for result in results:
+        if result["error"]:
+            errors[result["error"]] = errors.get(result["error"], 0) + 1
+    tokens = sum(result["tokens"] for result in ok)
+    print(f"{len(results)} requests in {elapsed:.1f}s: {len(ok) / elapsed:.2f} answers/s, {tokens / elapsed:.1f} tokens/s")
+    if errors:
+        print("Errors: " + ", ".join(f"{name} x{count}" for name, count in sorted(errors.items())))
+    for name in ("ttft", "latency"):
+        values = [result[name] for result in ok if result[name] is not None]
+        print(f"{name:<8}" + "  ".join(f"p{pct} {percentile(values, pct) or 0:.3f}s" for pct in PERCENTILES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive concurrent simulated Gratitude AI sessions and report "
+                                                 "throughput and latency percentiles.")
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent simulated users")
+    parser.add_argument("--requests", type=int, default=5, help="Questions asked by each session")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean seconds between a session's questions")
+    parser.add_argument("--shared-prompts", action="store_true",
+                        help="Let sessions ask identical questions, so the scheduler can coalesce them")
+    parser.add_argument("--direct", action="store_true", help="Call the client directly instead of the scheduler")
+    parser.add_argument("--standins", type=int, default=1,
+                        help="Local stand-in servers to start; 0 to use OLLAMA_URL(S) as configured")
+    parser.add_argument("--tokens-per-second", type=float, default=30.0, help="Stand-in token rate")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stand-in seconds before the first token")
+    parser.add_argument("--max-tokens", type=int, default=60, help="Stand-in answer length")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Stand-in fraction of HTTP 500 answers")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Stand-in fraction of streams cut off")
+    args = parser.parse_args()
+
+    if args.standins:
+        from ollama_standin import StandinSettings, serve
+
+        servers = [
+            serve(0, settings=StandinSettings(args.tokens_per_second, args.latency, 0.0, args.error_rate,
+                                              args.drop_rate, args.max_tokens, seed=index), background=True)
+            for index in range(args.standins)
+        ]
+        # The client reads its endpoints when it is imported, so this has to come first
+        os.environ["OLLAMA_URLS"] = ",".join(f"http://127.0.0.1:{server.server_address[1]}" for server in servers)
+
+    import ollama_client
+    import ollama_scheduler
+
+    if args.direct:
+        def submit(user_id, payload):
+            return ollama_client.stream_generate(payload)
+    else:
+        submit = ollama_scheduler.submit
+    print(f"{args.sessions} sessions x {args.requests} questions against "
+          f"{', '.join(endpoint.base_url for endpoint in ollama_client.endpoints)}")
+
+    results = []
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=run_session, args=(session, args.requests, args.think_time, args.shared_prompts,
+                                                   results, submit))
+        for session in range(args.sessions)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report(results, time.perf_counter() - started)
+    for status in ollama_client.endpoint_status():
+        print(f"{status['url']}: {status['served']} requests, {'healthy' if status['healthy'] else 'down'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import bisect
+import threading
+from collections import deque
+
+METRICS_LOG_FILE = "ai_metrics.jsonl"  # One line per generated answer
+METRICS_FILE = os.environ.get("AI_METRICS_FILE", "ai_metrics.prom")  # Prometheus text format, rewritten after each request
+METRICS_WINDOW = 1000  # Recent requests kept in memory for the tokens/second percentiles
+
+# Upper bounds in seconds for the latency histograms; the last bucket is +Inf
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+PERCENTILES = (50, 90, 99)
+
+_lock = threading.Lock()
+_histograms = {}  # (metric, model) -> {"counts": [...], "sum": seconds, "count": n}
+_tokens_per_second = {}  # model -> deque of the most recent samples
+_counters = {"requests": 0, "errors": 0}
+
+
+def _ns_to_seconds(value):
+    return value / 1e9 if value else None
+
+
+def measure(final_chunk, ttft=None, latency=None):
+    """Return the timings of one request from Ollama's final chunk and the wall clock.
+
+    Ollama reports durations in nanoseconds; they are converted to seconds here.
+    ``ttft`` and ``latency`` are the wall-clock seconds to the first token and to
+    the end of the stream, as seen by the page.
+    """
+    final_chunk = final_chunk or {}
+    eval_count = final_chunk.get("eval_count")
+    eval_duration = _ns_to_seconds(final_chunk.get("eval_duration"))
+    prompt_eval_count = final_chunk.get("prompt_eval_count")
+    prompt_eval_duration = _ns_to_seconds(final_chunk.get("prompt_eval_duration"))
+    return {
+        "ttft": ttft,
+        "latency": latency,
+        "load_duration": _ns_to_seconds(final_chunk.get("load_duration")),
+        "prompt_eval_count": prompt_eval_count,
+        "prompt_eval_duration": prompt_eval_duration,
+        "eval_count": eval_count,
+        "eval_duration": eval_duration,
+        "tokens_per_second": eval_count / eval_duration if eval_count and eval_duration else None,
+        "prompt_tokens_per_second": (prompt_eval_count / prompt_eval_duration
+                                     if prompt_eval_count and prompt_eval_duration else None),
+    }
+
+
+def record(model, timings, **fields):
+    """Log one request and add it to the in-memory histograms.
+
+    ``timings`` comes from ``measure``; any extra ``fields`` (the route, the prompt
+    length, an error message) are only written to the request log.
+    """
+    entry = {"timestamp": time.time(), "model": model, **fields, **timings}
+    with _lock:
+        _counters["requests"] += 1
+        if entry.get("error"):
+            _counters["errors"] += 1
+        for metric in ("ttft", "latency", "load_duration", "prompt_eval_duration"):
+            if timings.get(metric) is not None:
+                _observe(metric, model, timings[metric])
+        if timings.get("tokens_per_second"):
+            _tokens_per_second.setdefault(model, deque(maxlen=METRICS_WINDOW)).append(timings["tokens_per_second"])
+        with open(METRICS_LOG_FILE, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        _write_metrics_file()
+
+
+def _observe(metric, model, value):
+    # Called with _lock held
+    histogram = _histograms.setdefault((metric, model), {
+        "counts": [0] * (len(LATENCY_BUCKETS) + 1), "sum": 0.0, "count": 0})
+    histogram["counts"][bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+    histogram["sum"] += value
+    histogram["count"] += 1
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values``, or None when there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def render_prometheus():
+    """Return the current metrics in the Prometheus text exposition format."""
+    lines = [
+        "# TYPE gratitude_ai_requests_total counter",
+        f"gratitude_ai_requests_total {_counters['requests']}",
+        "# TYPE gratitude_ai_errors_total counter",
+        f"gratitude_ai_errors_total {_counters['errors']}",
+    ]
+    for metric in sorted({metric for metric, _ in _histograms}):
+        lines.append(f"# TYPE gratitude_ai_{metric}_seconds histogram")
+        for (name, model), histogram in sorted(_histograms.items()):
+            if name != metric:
+                continue
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), histogram["counts"]):
+                cumulative += count
+                lines.append(f'gratitude_ai_{metric}_seconds_bucket{{model="{model}",le="{bound}"}} {cumulative}')
+            lines.append(f'gratitude_ai_{metric}_seconds_sum{{model="{model}"}} {histogram["sum"]:.6f}')
+            lines.append(f'gratitude_ai_{metric}_seconds_count{{model="{model}"}} {histogram["count"]}')
+    lines.append("# TYPE gratitude_ai_tokens_per_second summary")
+    for model, samples in sorted(_tokens_per_second.items()):
+        for pct in PERCENTILES:
+            lines.append(f'gratitude_ai_tokens_per_second{{model="{model}",quantile="{pct / 100}"}} '
+                         f'{percentile(samples, pct):.3f}')
+    return "\n".join(lines) + "\n"
+
+
+def _write_metrics_file():
+    # Called with _lock held; written atomically so a scraper never reads half a file
+    tmp_path = f"{METRICS_FILE}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, METRICS_FILE)
+
+
+def summarize(log_file=METRICS_LOG_FILE, since=None):
+    """Return latency and tokens/second percentiles per model from the request log."""
+    samples = {}
+    if not os.path.exists(log_file):
+        return samples
+    with open(log_file, "r") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if since and entry["timestamp"] < since:
+                continue
+            model = samples.setdefault(entry["model"], {"requests": 0, "errors": 0, "ttft": [],
+                                                        "latency": [], "tokens_per_second": []})
+            model["requests"] += 1
+            model["errors"] += 1 if entry.get("error") else 0
+            for metric in ("ttft", "latency", "tokens_per_second"):
+                if entry.get(metric) is not None:
+                    model[metric].append(entry[metric])
+    return {
+        name: {
+            "requests": model["requests"],
+            "errors": model["errors"],
+            **{f"{metric}_p{pct}": percentile(model[metric], pct)
+               for metric in ("ttft", "latency", "tokens_per_second") for pct in PERCENTILES},
+        }
+        for name, model in samples.items()
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show Gratitude AI latency and throughput percentiles.")
+    parser.add_argument("--hours", type=float, help="Only include requests from the last N hours")
+    args = parser.parse_args()
+
+    def fmt(value, unit=""):
+        return f"{value:.2f}{unit}" if value is not None else "-"
+
+    summary = summarize(since=time.time() - args.hours * 3600 if args.hours else None)
+    print(f"{'model':<20} {'requests':>8} {'errors':>6}  {'TTFT p50/p90/p99':<24} "
+          f"{'latency p50/p90/p99':<24} tokens/s p50/p90/p99")
+    for name, stats in sorted(summary.items()):
+        columns = ["/".join(fmt(stats[f"{metric}_p{pct}"], unit) for pct in PERCENTILES)
+                   for metric, unit in (("ttft", "s"), ("latency", "s"), ("tokens_per_second", ""))]
+        print(f"{name:<20} {stats['requests']:>8} {stats['errors']:>6}  {columns[0]:<24} {columns[1]:<24} {columns[2]}")
@@ -0,0 +1,95 @@
+import sys
+import time
+from bisect import bisect_right
+
+# Each phase is (name, action, seconds); the action says how the breathing guide moves:
+# "inhale" grows it, "exhale" shrinks it and "hold" keeps it still
+PROGRAMS = {
+    "Box Breathing (4-4-4-4)": {
+        "phases": [("Inhale", "inhale", 4), ("Hold", "hold", 4), ("Exhale", "exhale", 4), ("Hold", "hold", 4)],
+        "cycles": 6,
+    },
+    "Belly Breathing": {
+        "phases": [("Breathe into your belly", "inhale", 4), ("Let your belly fall", "exhale", 6)],
+        "cycles": 30,  # About 5 minutes
+    },
+    "4-7-8 Relaxing Breath": {
+        "phases": [("Inhale", "inhale", 4), ("Hold", "hold", 7), ("Exhale", "exhale", 8)],
+        "cycles": 4,
+    },
+}
+
+
+def timeline(program, cycles=None):
+    """Lay out every phase of ``program`` with its start, relative to the start of the session.
+
+    Starts are summed from the phase lengths once, so a phase boundary is a fixed
+    offset from the session start and never depends on when earlier phases
+    happened to be shown. Returns a list of dicts, which also serializes to JSON
+    for the browser.
+    """
+    cycles = cycles or program["cycles"]
+    phases = []
+    start = 0
+    for cycle in range(cycles):
+        for name, action, seconds in program["phases"]:
+            phases.append({"name": name, "action": action, "start": start, "seconds": seconds, "cycle": cycle})
+            start += seconds
+    return phases
+
+
+def duration(phases):
+    return phases[-1]["start"] + phases[-1]["seconds"] if phases else 0
+
+
+def position(phases, elapsed):
+    """Return where a session is ``elapsed`` seconds after it started.
+
+    The dict has the current ``phase`` (None once the session is over), its
+    ``index``, the seconds ``remaining`` in it, the ``progress`` through it from
+    0 to 1, and ``done``. Sessions keep no state besides their start time, so any
+    number of them can be served by whoever happens to ask, without a timer or
+    thread per session.
+    """
+    if elapsed >= duration(phases):
+        return {"phase": None, "index": len(phases), "remaining": 0, "progress": 1.0, "done": True}
+    starts = [phase["start"] for phase in phases]
+    index = max(0, bisect_right(starts, elapsed) - 1)
+    phase = phases[index]
+    into = max(0.0, elapsed - phase["start"])
+    return {"phase": phase, "index": index, "remaining": phase["seconds"] - into,
+            "progress": into / phase["seconds"], "done": False}
+
+
+def run(phases, on_phase, started=None, clock=time.monotonic, sleep=time.sleep):
+    """Call ``on_phase(phase)`` at the start of each phase, waiting for absolute deadlines.
+
+    Each wait is for ``started + phase["start"]``, so time spent in ``on_phase``
+    or oversleeping shortens the next wait instead of pushing every later phase
+    back. Phases whose deadline has already passed are skipped.
+    """
+    started = clock() if started is None else started
+    index = 0
+    while True:
+        now = clock()
+        current = position(phases, now - started)
+        if current["done"]:
+            return
+        if current["index"] >= index:
+            on_phase(current["phase"])
+            index = current["index"] + 1
+        if index >= len(phases):
+            sleep(max(0.0, started + duration(phases) - clock()))
+        else:
+            sleep(max(0.0, started + phases[index]["start"] - clock()))
+
+
+if __name__ == "__main__":
+    # python breathing.py ["program name" [cycles]]: follow a program in the terminal
+    name = sys.argv[1] if len(sys.argv) > 1 else next(iter(PROGRAMS))
+    phases = timeline(PROGRAMS[name], int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    started = time.monotonic()
+    print(f"{name}: {len(phases)} phases, {duration(phases)} seconds")
+    run(phases, lambda phase: print(f"[{time.monotonic() - started:7.3f}s] cycle {phase['cycle'] + 1}: "
+                                    f"{phase['name']} for {phase['seconds']}s"), started)
+    print(f"[{time.monotonic() - started:7.3f}s] Done")
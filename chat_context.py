@@ -0,0 +1,147 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import chat_log
+from ollama_client import generate
+
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("AI_CONTEXT_TOKEN_BUDGET", "1200"))  # For summary plus recent turns
+CONTEXT_MAX_TURNS = 20  # Recent turns considered for packing
+SUMMARY_MAX_TURNS = 40  # Older turns folded into the summary per background run
+SUMMARY_MAX_TOKENS = 200
+SYSTEM_PROMPT_VERSION = 2  # Bump when SYSTEM_PROMPT changes so cached answers are not reused
+
+SYSTEM_PROMPT = """
+        You are 'The Mind Partner' – a thoughtful AI designed to guide users 
+        through mindfulness, self-awareness, and mental well-being.
+
+        When responding, focus on:
+        - Encouraging mindfulness and self-reflection
+        - Providing practical meditation and relaxation techniques
+        - Offering perspective shifts to reduce stress and anxiety
+        - Promoting gratitude, positivity, and emotional balance
+
+        Be warm, empathetic, and inspiring.
+        If the user is anxious, gently guide them towards calmness.
+        If they are curious, provide insightful mindfulness teachings.
+
+        {context}
+
+        Here’s the user's question:
+        {prompt}
+    """
+
+SUMMARY_PROMPT = """Summarize the conversation below between a user and 'The Mind Partner', a mindfulness
+assistant, in at most 120 words. Keep what the user shared about themselves, their feelings and
+goals, and any advice they found useful. Write in the third person about "the user".
+
+Summary so far:
+{summary}
+
+New conversation turns:
+{turns}
+
+Updated summary:"""
+
+_summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-summary")
+_summaries_running = set()
+_summaries_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+def summary_path(user_id):
+    return os.path.join(chat_log.CHAT_HISTORY_DIR, f"{user_id}.summary.json")
+
+
+def load_summary(user_id):
+    """Return ``{"summary": text, "until": timestamp}``; ``until`` is the newest turn folded in."""
+    try:
+        with open(summary_path(user_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {"summary": "", "until": 0}
+
+
+def save_summary(user_id, summary, until):
+    os.makedirs(chat_log.CHAT_HISTORY_DIR, exist_ok=True)
+    path = summary_path(user_id)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump({"summary": summary, "until": until}, f, ensure_ascii=False)
+    os.replace(f"{path}.tmp", path)
+
+
+def clear_summary(user_id):
+    if os.path.exists(summary_path(user_id)):
+        os.remove(summary_path(user_id))
+
+
+def format_turns(turns):
+    return "\n".join(f"User: {turn['user']}\nMind Partner: {turn['bot']}" for turn in turns)
+
+
+def build_context(user_id, model, budget=CONTEXT_TOKEN_BUDGET):
+    """Return the conversation context to send with the next prompt.
+
+    The newest turns are packed until the token budget is spent; anything older is
+    represented by the rolling summary. When turns have fallen out of the window
+    but aren't summarized yet, a background summary update is started, so the
+    request itself never waits for it.
+    """
+    summary = load_summary(user_id)
+    budget -= estimate_tokens(summary["summary"])
+
+    turns = chat_log.read_tail(user_id, CONTEXT_MAX_TURNS)
+    packed = []
+    for turn in reversed(turns):
+        cost = estimate_tokens(format_turns([turn]))
+        if cost > budget:
+            break
+        packed.insert(0, turn)
+        budget -= cost
+
+    dropped = turns[:len(turns) - len(packed)]
+    unsummarized = [turn for turn in dropped if turn.get("timestamp", 0) > summary["until"]]
+    if unsummarized:
+        schedule_summary(user_id, model, unsummarized[-1]["timestamp"])
+
+    parts = []
+    if summary["summary"]:
+        parts.append(f"Summary of the earlier conversation:\n{summary['summary']}")
+    if packed:
+        parts.append(f"Recent conversation:\n{format_turns(packed)}")
+    return "\n\n".join(parts)
+
+
+def schedule_summary(user_id, model, until):
+    """Fold unsummarized turns up to ``until`` into the user's summary on the background worker."""
+    with _summaries_lock:
+        if user_id in _summaries_running:
+            return  # One update at a time per user; the next request picks up the rest
+        _summaries_running.add(user_id)
+    _summary_executor.submit(_update_summary, user_id, model, until)
+
+
+def _update_summary(user_id, model, until):
+    try:
+        summary = load_summary(user_id)
+        turns = [
+            turn for turn in chat_log.read_tail(user_id, CONTEXT_MAX_TURNS + SUMMARY_MAX_TURNS)
+            if summary["until"] < turn.get("timestamp", 0) <= until
+        ][:SUMMARY_MAX_TURNS]  # Oldest first; anything left over is folded in by the next run
+        if not turns:
+            return
+        prompt = SUMMARY_PROMPT.format(summary=summary["summary"] or "(none yet)", turns=format_turns(turns))
+        result = generate({"model": model, "prompt": prompt, "options": {"num_predict": SUMMARY_MAX_TOKENS}})
+        if not os.path.exists(chat_log.history_path(user_id)):
+            return  # The history was cleared while the summary was being generated
+        save_summary(user_id, result.get("response", "").strip(), turns[-1]["timestamp"])
+    except Exception as e:
+        print(f"Failed to update the chat summary for {user_id}: {e}")
+    finally:
+        with _summaries_lock:
+            _summaries_running.discard(user_id)
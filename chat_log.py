@@ -0,0 +1,63 @@
+import os
+import json
+import threading
+
+CHAT_HISTORY_DIR = "chat_history"
+READ_BLOCK_SIZE = 8192
+
+_write_lock = threading.Lock()
+
+
+def history_path(user_id):
+    return os.path.join(CHAT_HISTORY_DIR, f"{user_id}.jsonl")
+
+
+def append_turn(user_id, turn):
+    """Append one chat turn to the user's log. Earlier turns are never rewritten."""
+    os.makedirs(CHAT_HISTORY_DIR, exist_ok=True)
+    line = json.dumps(turn, ensure_ascii=False) + "\n"
+    with _write_lock:
+        with open(history_path(user_id), "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def read_tail(user_id, count, skip=0):
+    """Return up to ``count`` turns ending ``skip`` turns before the newest, oldest first.
+
+    Only the end of the log is read, so the cost depends on ``count + skip`` and not
+    on the length of the whole history.
+    """
+    path = history_path(user_id)
+    if count <= 0 or not os.path.exists(path):
+        return []
+    wanted = count + skip
+
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        data = b""
+        # Read backwards until the block holds enough complete lines (plus the one before)
+        while position > 0 and data.count(b"\n") <= wanted:
+            step = min(READ_BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+
+    lines = data.split(b"\n")
+    if position > 0:
+        lines = lines[1:]  # The first line may be cut off by the block boundary
+    turns = []
+    for line in lines[-(wanted + 1):]:
+        if line.strip():
+            try:
+                turns.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # Skip a torn or corrupted line
+    if skip:
+        turns = turns[:-skip]
+    return turns[-count:]
+
+
+def clear_history(user_id):
+    with _write_lock:
+        if os.path.exists(history_path(user_id)):
+            os.remove(history_path(user_id))
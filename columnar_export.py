@@ -0,0 +1,133 @@
+import os
+import csv
+import time
+import argparse
+from datetime import datetime
+
+from entry_store import JOURNAL_ROOT, TIMESTAMP_FORMAT, content_hash, load_entries
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Only needed for the parquet and arrow formats
+    pa = None
+
+EXPORT_FORMATS = ["parquet", "arrow", "csv"]
+BATCH_ROWS = 50000  # Rows held in memory before a row group / record batch is written
+
+COLUMNS = ["user_id", "entry_id", "timestamp", "sentiment", "polarity", "content_length", "content_hash"]
+
+
+def arrow_schema():
+    return pa.schema([
+        ("user_id", pa.string()),
+        ("entry_id", pa.string()),
+        ("timestamp", pa.int64()),  # Seconds since the epoch
+        ("sentiment", pa.string()),
+        ("polarity", pa.float64()),
+        ("content_length", pa.int32()),
+        ("content_hash", pa.string()),
+    ])
+
+
+def to_epoch(timestamp):
+    try:
+        return int(datetime.strptime(timestamp, TIMESTAMP_FORMAT).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+def iter_rows(journal_root=JOURNAL_ROOT, user_ids=None, since=None, until=None, sentiment=None):
+    """Yield one export row per journal entry, optionally filtered by user, time range and sentiment."""
+    for user_id in sorted(os.listdir(journal_root)):
+        user_folder = os.path.join(journal_root, user_id)
+        if not os.path.isdir(user_folder) or (user_ids and user_id not in user_ids):
+            continue
+        for entry in load_entries(user_folder):
+            epoch = to_epoch(entry.get("timestamp"))
+            if since is not None and (epoch is None or epoch < since):
+                continue
+            if until is not None and (epoch is None or epoch >= until):
+                continue
+            if sentiment and entry.get("sentiment") != sentiment:
+                continue
+            yield {
+                "user_id": user_id,
+                "entry_id": entry["id"],
+                "timestamp": epoch,
+                "sentiment": entry.get("sentiment"),
+                "polarity": entry.get("polarity"),
+                "content_length": len(entry["content"]),
+                "content_hash": entry.get("content_hash") or content_hash(entry["content"]),
+            }
+
+
+def iter_batches(rows, batch_rows=BATCH_ROWS):
+    batch = {column: [] for column in COLUMNS}
+    size = 0
+    for row in rows:
+        for column in COLUMNS:
+            batch[column].append(row[column])
+        size += 1
+        if size >= batch_rows:
+            yield batch
+            batch = {column: [] for column in COLUMNS}
+            size = 0
+    if size:
+        yield batch
+
+
+def export_entries(output_path, fmt, rows, batch_rows=BATCH_ROWS):
+    """Write ``rows`` to ``output_path`` in batches, so memory stays bounded. Returns the row count."""
+    if fmt in ("parquet", "arrow") and pa is None:
+        raise RuntimeError(f"Exporting to {fmt} needs the pyarrow package (pip install pyarrow)")
+
+    count = 0
+    if fmt == "csv":
+        with open(output_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            for batch in iter_batches(rows, batch_rows):
+                writer.writerows(zip(*(batch[column] for column in COLUMNS)))
+                count += len(batch["user_id"])
+        return count
+
+    schema = arrow_schema()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(output_path, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(output_path, schema)
+    try:
+        for batch in iter_batches(rows, batch_rows):
+            table = pa.Table.from_pydict(batch, schema=schema)
+            writer.write_table(table)  # One row group / record batch per batch
+            count += table.num_rows
+    finally:
+        writer.close()
+    return count
+
+
+def parse_date(value):
+    return int(datetime.strptime(value, "%Y-%m-%d").timestamp())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export journal entries for analytics.")
+    parser.add_argument("output", help="File to write, e.g. entries.parquet")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, help="Defaults to the output file's extension")
+    parser.add_argument("--root", default=JOURNAL_ROOT, help="Journal folder to export")
+    parser.add_argument("--user", action="append", dest="users", help="Only export this user id (repeatable)")
+    parser.add_argument("--since", type=parse_date, help="Only entries on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--until", type=parse_date, help="Only entries before this date (YYYY-MM-DD)")
+    parser.add_argument("--sentiment", choices=["Positive", "Neutral", "Negative"])
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    args = parser.parse_args()
+
+    fmt = args.format or os.path.splitext(args.output)[1].lstrip(".").lower()
+    if fmt not in EXPORT_FORMATS:
+        parser.error(f"Unknown format '{fmt}', use --format with one of: {', '.join(EXPORT_FORMATS)}")
+
+    started = time.perf_counter()
+    rows = iter_rows(args.root, set(args.users or []), args.since, args.until, args.sentiment)
+    count = export_entries(args.output, fmt, rows, args.batch_rows)
+    print(f"Exported {count} entries to {args.output} in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,36 @@
+import io
+import gzip
+import json
+
+CHUNK_ENTRIES = 500  # Entries serialized per chunk when streaming a download
+
+
+def entry_text(entry):
+    """Plain-text rendering of an entry, as used by the .txt downloads and emails."""
+    return f"Title: {entry['title']}\nDate: {entry['timestamp']}\n\n{entry['content']}"
+
+
+def iter_metadata_json(entries):
+    """Yield the compact JSON array of ``entries`` a chunk at a time."""
+    yield "["
+    for start in range(0, len(entries), CHUNK_ENTRIES):
+        chunk = ",".join(json.dumps(entry, separators=(",", ":")) for entry in entries[start:start + CHUNK_ENTRIES])
+        yield chunk if start == 0 else "," + chunk
+    yield "]"
+
+
+def build_payload(chunks, compress=False):
+    """Write text chunks into an in-memory file, gzip-compressing them as they arrive."""
+    buffer = io.BytesIO()
+    if compress:
+        with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=6, mtime=0) as gz:
+            for chunk in chunks:
+                gz.write(chunk.encode("utf-8"))
+    else:
+        for chunk in chunks:
+            buffer.write(chunk.encode("utf-8"))
+    return buffer.getvalue()
+
+
+def metadata_payload(entries, compress=False):
+    return build_payload(iter_metadata_json(entries), compress)
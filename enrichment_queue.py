@@ -0,0 +1,289 @@
+import os
+import sys
+import json
+import time
+import threading
+
+import ollama_scheduler
+from entry_store import JOURNAL_ROOT, load_records, read_blob, update_entries
+from ollama_client import DEFAULT_MODEL, generate
+
+ENRICHMENT_DIR = os.environ.get("ENRICHMENT_DIR", "enrichment")
+JOBS_DIR = "jobs"  # One file per pending job, so the queue survives restarts
+CACHE_DIR = "cache"  # Results by content hash; identical text is only enriched once
+FAILED_DIR = "failed"  # Jobs that ran out of attempts, kept for inspection
+ENRICHMENT_MODEL = os.environ.get("ENRICHMENT_MODEL", DEFAULT_MODEL)
+ENRICHMENT_VERSION = 1  # Bump when ENRICHMENT_PROMPT changes so cached results are redone
+BATCH_SIZE = 8  # Entries per model request
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 30  # Seconds before the first retry; doubles with each attempt
+IDLE_POLL_INTERVAL = 5
+ENTRY_MAX_CHARS = 1500
+
+ENRICHMENT_PROMPT = """For each numbered journal entry below, identify the emotions the writer expresses,
+what they are grateful for, and summarize the entry in one short sentence.
+
+Answer with JSON only, in this form:
+{{"entries": [{{"number": 1, "emotions": ["calm", "joy"], "themes": ["family", "nature"], "summary": "..."}}]}}
+
+Use at most 3 emotions and 3 themes per entry, as lowercase words.
+
+{entries}"""
+
+_wakeup = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _path(*parts):
+    return os.path.join(ENRICHMENT_DIR, *parts)
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def enqueue(user_folder, records):
+    """Queue enrichment jobs for ``records`` (entry records with ``id`` and ``content_hash``).
+
+    Records that are already enriched with the current version are skipped, and
+    so is text whose job failed before; ``retry_failed`` queues that again.
+    Cheap enough to call right after a save; the work happens on the worker
+    started by ``start``.
+    """
+    failed = {job["content_hash"] for _, job in failed_jobs()}
+    queued = 0
+    for record in records:
+        if "content_hash" not in record:
+            continue  # Legacy record; picked up by enqueue_missing once it has been migrated
+        if record.get("enrichment", {}).get("version") == ENRICHMENT_VERSION or record["content_hash"] in failed:
+            continue
+        job_path = _path(JOBS_DIR, f"{record['content_hash']}-{record['id']}.json")
+        if os.path.exists(job_path):
+            continue
+        _write_json(job_path, {
+            "user_folder": user_folder,
+            "entry_id": record["id"],
+            "content_hash": record["content_hash"],
+            "attempts": 0,
+            "not_before": 0,
+            "created": time.time(),
+        })
+        queued += 1
+    if queued:
+        _wakeup.set()
+    return queued
+
+
+def enqueue_missing(user_folder):
+    """Queue every entry of the user that has no current enrichment yet."""
+    return enqueue(user_folder, load_records(user_folder))
+
+
+def pending_jobs():
+    """Return the queued jobs, oldest first."""
+    return _list_jobs(JOBS_DIR)
+
+
+def failed_jobs(user_folder=None):
+    """Return the jobs that ran out of attempts, oldest first, optionally only ``user_folder``'s."""
+    return [(name, job) for name, job in _list_jobs(FAILED_DIR)
+            if user_folder is None or job["user_folder"] == user_folder]
+
+
+def retry_failed(user_folder=None):
+    """Queue failed jobs again with fresh attempts, e.g. after the model was fixed or changed."""
+    jobs = failed_jobs(user_folder)
+    for name, job in jobs:
+        job.update(attempts=0, not_before=0)
+        job.pop("error", None)
+        _write_json(_path(JOBS_DIR, name), job)
+        os.remove(_path(FAILED_DIR, name))
+    if jobs:
+        _wakeup.set()
+    return len(jobs)
+
+
+def _list_jobs(directory):
+    folder = _path(directory)
+    if not os.path.isdir(folder):
+        return []
+    jobs = []
+    for name in os.listdir(folder):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(folder, name), "r") as f:
+                jobs.append((name, json.load(f)))
+        except (OSError, json.JSONDecodeError):
+            continue  # Being written or already finished
+    return sorted(jobs, key=lambda job: job[1]["created"])
+
+
+def cached_result(content_hash):
+    try:
+        with open(_path(CACHE_DIR, content_hash[:2], f"{content_hash}.json"), "r") as f:
+            result = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return result if result.get("version") == ENRICHMENT_VERSION else None
+
+
+def _clean_words(values):
+    if not isinstance(values, list):
+        return []
+    return [str(value).strip().lower() for value in values if str(value).strip()][:3]
+
+
+def enrich_batch(texts, model=ENRICHMENT_MODEL):
+    """Ask the model to enrich several entry texts at once.
+
+    Returns a list with a result dict, or None where the model's answer for that
+    entry was missing or unusable, in the order of ``texts``.
+    """
+    numbered = "\n\n".join(f"Entry {number}:\n{text[:ENTRY_MAX_CHARS]}" for number, text in enumerate(texts, 1))
+    response = generate({"model": model, "prompt": ENRICHMENT_PROMPT.format(entries=numbered), "format": "json"})
+    try:
+        answers = json.loads(response.get("response", "")).get("entries", [])
+    except (json.JSONDecodeError, AttributeError):
+        return [None] * len(texts)
+
+    results = [None] * len(texts)
+    for answer in answers:
+        if not isinstance(answer, dict) or not isinstance(answer.get("number"), int):
+            continue
+        position = answer["number"] - 1
+        if 0 <= position < len(texts) and isinstance(answer.get("summary"), str):
+            results[position] = {
+                "emotions": _clean_words(answer.get("emotions")),
+                "themes": _clean_words(answer.get("themes")),
+                "summary": answer["summary"].strip(),
+                "model": model,
+                "version": ENRICHMENT_VERSION,
+            }
+    return results
+
+
+def _write_back(user_folder, results):
+    """Store results on their entries, skipping entries whose text changed since they were queued."""
+    def apply(records):
+        for record in records:
+            result = results.get(record["id"])
+            if result is not None and record.get("content_hash") == result[0]:
+                record["enrichment"] = result[1]
+        return records
+
+    update_entries(user_folder, apply)
+
+
+def _retry(name, job, error):
+    job["attempts"] += 1
+    job["error"] = str(error)
+    if job["attempts"] >= MAX_ATTEMPTS:
+        _write_json(_path(FAILED_DIR, name), job)
+        os.remove(_path(JOBS_DIR, name))
+        print(f"Giving up on enriching entry {job['entry_id']}: {error}")
+        return
+    job["not_before"] = time.time() + RETRY_DELAY * 2 ** (job["attempts"] - 1)
+    _write_json(_path(JOBS_DIR, name), job)
+
+
+def due_jobs():
+    """Return the queued jobs whose retry delay has passed, oldest first."""
+    now = time.time()
+    return [(name, job) for name, job in pending_jobs() if job["not_before"] <= now]
+
+
+def process(due):
+    """Run one batch of ``(name, job)`` pairs: apply cached results, enrich the rest, write back."""
+    # Cached results are applied as they are; the rest go to the model together
+    results = {}  # job name -> result
+    uncached = []
+    for name, job in due:
+        result = cached_result(job["content_hash"])
+        if result is not None:
+            results[name] = result
+            continue
+        try:
+            text = read_blob(job["user_folder"], job["content_hash"])
+        except FileNotFoundError:
+            os.remove(_path(JOBS_DIR, name))  # The entry was deleted and its text collected
+            continue
+        uncached.append((name, job, text))
+
+    if uncached:
+        try:
+            batch = enrich_batch([text for _, _, text in uncached])
+        except Exception as e:
+            batch = [e] * len(uncached)
+        for (name, job, _), result in zip(uncached, batch):
+            if isinstance(result, dict):
+                _write_json(_path(CACHE_DIR, job["content_hash"][:2], f"{job['content_hash']}.json"), result)
+                results[name] = result
+            else:
+                _retry(name, job, result or "the model gave no usable answer")
+
+    by_folder = {}
+    for name, job in due:
+        if name in results:
+            by_folder.setdefault(job["user_folder"], {})[job["entry_id"]] = (job["content_hash"], results[name])
+    for user_folder, folder_results in by_folder.items():
+        _write_back(user_folder, folder_results)
+    for name in results:
+        os.remove(_path(JOBS_DIR, name))
+
+
+def start():
+    """Start the background worker once per process.
+
+    The worker pauses while ``ollama_scheduler`` has generations queued or
+    running, so enrichment only uses model time that interactive chat leaves over.
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_work, name="entry-enrichment", daemon=True)
+            _worker.start()
+
+
+def _work():
+    # The job list is read once and worked through, instead of listing the queue for each batch
+    jobs = []
+    while True:
+        if not jobs:
+            _wakeup.wait(IDLE_POLL_INTERVAL)  # Woken early by enqueue
+            _wakeup.clear()
+            jobs = due_jobs()
+            continue
+        if ollama_scheduler.active():
+            time.sleep(IDLE_POLL_INTERVAL)  # People are waiting for the model; their questions go first
+            continue
+        batch, jobs = jobs[:BATCH_SIZE], jobs[BATCH_SIZE:]
+        try:
+            process(batch)
+        except Exception as e:
+            print(f"Enrichment worker error: {e}")
+
+
+if __name__ == "__main__":
+    # python enrichment_queue.py [--retry-failed] [root]: queue every unenriched entry and work through the queue
+    if "--retry-failed" in sys.argv:
+        print(f"{retry_failed()} failed jobs queued again")
+    args = [arg for arg in sys.argv[1:] if arg != "--retry-failed"]
+    root = args[0] if args else JOURNAL_ROOT
+    for user_id in sorted(os.listdir(root)):
+        if os.path.isdir(os.path.join(root, user_id)):
+            print(f"{user_id}: {enqueue_missing(os.path.join(root, user_id))} entries queued")
+    while pending_jobs():
+        jobs = due_jobs()
+        if not jobs:
+            time.sleep(IDLE_POLL_INTERVAL)  # Only retries that aren't due yet are left
+        for offset in range(0, len(jobs), BATCH_SIZE):
+            started = time.perf_counter()
+            process(jobs[offset:offset + BATCH_SIZE])
+            print(f"{min(offset + BATCH_SIZE, len(jobs))}/{len(jobs)} jobs done, "
+                  f"last batch in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,247 @@
+import io
+import os
+import sys
+import csv
+import json
+import time
+import uuid
+import zipfile
+from datetime import datetime
+
+from entry_store import JOURNAL_ROOT, TIMESTAMP_FORMAT, content_hash, load_entries, update_entries
+from sentiment import analyze_sentiments
+
+IMPORT_FORMATS = ["jsonl", "csv", "json", "zip"]
+COMMIT_EVERY = 5000  # Entries scored and written per chunk
+READ_SIZE = 1 << 16
+
+CONTENT_FIELDS = ["content", "text", "body", "entry"]
+TITLE_FIELDS = ["title", "name", "subject"]
+TIMESTAMP_FIELDS = ["timestamp", "date", "created_at", "created"]
+TIMESTAMP_INPUT_FORMATS = [TIMESTAMP_FORMAT, "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y"]
+
+
+def detect_format(filename):
+    extension = os.path.splitext(filename)[1].lower().lstrip(".")
+    if extension == "ndjson":
+        return "jsonl"
+    if extension not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format '.{extension}'. Use one of: {', '.join(IMPORT_FORMATS)}")
+    return extension
+
+
+def _iter_text(stream, read):
+    # Detach afterwards so closing the wrapper doesn't close the caller's stream
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        yield from read(text)
+    finally:
+        text.detach()
+
+
+def iter_jsonl(stream):
+    for line in _iter_text(stream, iter):
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_csv(stream):
+    yield from _iter_text(stream, csv.DictReader)
+
+
+def iter_json_array(stream):
+    """Yield the items of a top-level JSON array without loading the whole document."""
+    yield from _iter_text(stream, _iter_json_array)
+
+
+def _iter_json_array(text):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    started = False
+    eof = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array of entries")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+                yield item
+                continue
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+        elif eof:
+            return
+        # Need more input: keep the unparsed tail and read the next block
+        chunk = text.read(READ_SIZE)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def _parse_exported_txt(name, text):
+    """Parse the 'Title: ...\\nDate: ...\\n\\ncontent' files written by the ZIP export."""
+    header, _, content = text.partition("\n\n")
+    record = {"title": os.path.splitext(os.path.basename(name))[0], "content": content}
+    for line in header.splitlines():
+        key, _, value = line.partition(": ")
+        if key == "Title":
+            record["title"] = value
+        elif key == "Date":
+            record["timestamp"] = value
+    return record
+
+
+def iter_zip(stream):
+    with zipfile.ZipFile(stream) as zf:
+        names = zf.namelist()
+        if "metadata.json" in names:
+            with zf.open("metadata.json") as member:
+                yield from iter_json_array(member)
+            return
+        # Archives without metadata fall back to their text files
+        for name in names:
+            if name.endswith(".txt"):
+                yield _parse_exported_txt(name, zf.read(name).decode("utf-8"))
+            elif name.endswith((".jsonl", ".ndjson")):
+                with zf.open(name) as member:
+                    yield from iter_jsonl(member)
+
+
+READERS = {"jsonl": iter_jsonl, "csv": iter_csv, "json": iter_json_array, "zip": iter_zip}
+
+
+def _first(record, fields):
+    for field in fields:
+        value = record.get(field)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def parse_timestamp(value):
+    """Return a journal timestamp string for the given value, or None if it can't be read."""
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value).strftime(TIMESTAMP_FORMAT)
+    value = str(value).strip()
+    for fmt in TIMESTAMP_INPUT_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime(TIMESTAMP_FORMAT)
+        except ValueError:
+            continue
+    try:
+        return datetime.fromisoformat(value).strftime(TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+
+def normalize_record(record, known_ids, now):
+    """Map an imported record onto the journal entry fields. Returns None for empty entries."""
+    content = _first(record, CONTENT_FIELDS)
+    if content is None or not str(content).strip():
+        return None
+    content = str(content).strip()
+
+    timestamp = None
+    raw_timestamp = _first(record, TIMESTAMP_FIELDS)
+    if raw_timestamp is not None:
+        timestamp = parse_timestamp(raw_timestamp)
+    timestamp = timestamp or now
+
+    entry_id = record.get("id")
+    if not entry_id or entry_id in known_ids:
+        entry_id = str(uuid.uuid4())
+
+    title = _first(record, TITLE_FIELDS)
+    return {
+        "id": entry_id,
+        "title": str(title).strip() if title else f"Entry {timestamp}",
+        "timestamp": timestamp,
+        "content": content,
+    }
+
+
+def import_entries(user_folder, stream, fmt, chunk_size=COMMIT_EVERY, progress=None):
+    """Stream entries from ``stream`` into the user's journal.
+
+    Entries are scored for sentiment and committed ``chunk_size`` at a time, so a
+    failure part-way keeps everything imported so far. Entries whose text and
+    timestamp already exist in the journal are skipped. ``progress`` is called
+    after each chunk with the number imported and the fraction of input read.
+    Returns ``(imported, skipped)``.
+    """
+    entries = load_entries(user_folder)
+    known_ids = {e["id"] for e in entries}
+    seen = {(content_hash(e["content"]), e["timestamp"]) for e in entries}
+    now = datetime.now().strftime(TIMESTAMP_FORMAT)
+
+    total_size = None
+    if stream.seekable():
+        total_size = stream.seek(0, io.SEEK_END)
+        stream.seek(0)
+
+    imported = 0
+    skipped = 0
+    pending = []
+
+    def commit():
+        nonlocal imported
+        scores = analyze_sentiments([e["content"] for e in pending])
+        for entry, (sentiment, polarity) in zip(pending, scores):
+            entry["sentiment"] = sentiment
+            entry["polarity"] = polarity
+        # Appended to what is stored now, so entries saved meanwhile (or enriched) are kept
+        update_entries(user_folder, lambda records: records + pending)
+        imported += len(pending)
+        pending.clear()
+        if progress:
+            fraction = min(stream.tell() / total_size, 1.0) if total_size else None
+            progress(imported, fraction)
+
+    for record in READERS[fmt](stream):
+        entry = normalize_record(record, known_ids, now) if isinstance(record, dict) else None
+        if entry is None:
+            skipped += 1
+            continue
+        key = (content_hash(entry["content"]), entry["timestamp"])
+        if key in seen:
+            skipped += 1
+            continue
+        seen.add(key)
+        known_ids.add(entry["id"])
+        pending.append(entry)
+        if len(pending) >= chunk_size:
+            commit()
+    if pending:
+        commit()
+    if progress:
+        progress(imported, 1.0)
+    return imported, skipped
+
+
+if __name__ == "__main__":
+    # python entry_import.py <user_id> <file> [format]
+    if len(sys.argv) < 3:
+        sys.exit("usage: python entry_import.py <user_id> <file> [jsonl|csv|json|zip]")
+    user_id, path = sys.argv[1], sys.argv[2]
+    fmt = sys.argv[3] if len(sys.argv) > 3 else detect_format(path)
+
+    def report(count, fraction):
+        done = f"{fraction:.0%}" if fraction is not None else "?"
+        print(f"\r{count} entries imported ({done} read)", end="", flush=True)
+
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        imported, skipped = import_entries(os.path.join(JOURNAL_ROOT, user_id), f, fmt, progress=report)
+    elapsed = time.perf_counter() - started
+    print(f"\nImported {imported} entries, skipped {skipped}, in {elapsed:.1f}s "
+          f"({imported / elapsed * 60 if elapsed else 0:,.0f} entries/minute)")
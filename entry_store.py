@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import zlib
+import tempfile
+import threading
+from hashlib import sha256
+from functools import lru_cache
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, zlib is always available
+    zstandard = None
+
+JOURNAL_ROOT = "journal_entries"
+METADATA_FILE = "metadata.json"
+TRASH_FILE = "trash.json"
+BLOB_DIR = "blobs"
+INDEX_DIR = "index"  # Search index derived from the entries, see journal_index.py
+TIMESTAMP_FORMAT = "%Y-%m-%d %H-%M-%S"
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+RAW_MARKER = b"\x00"  # Neither zlib nor zstd frames start with a zero byte
+
+_folder_locks = {}
+_folder_locks_lock = threading.Lock()
+
+
+def content_hash(content):
+    """Return the content address (sha256 hex digest) of an entry's text."""
+    return sha256(content.encode("utf-8")).hexdigest()
+
+
+def compress(data):
+    if zstandard is not None:
+        packed = zstandard.ZstdCompressor(level=10).compress(data)
+    else:
+        packed = zlib.compress(data, 9)
+    # Very short entries grow when compressed, those are kept as they are
+    return packed if len(packed) < len(data) + 1 else RAW_MARKER + data
+
+
+def decompress(blob):
+    # The codec is detected from the frame header so zlib and zstd blobs can coexist
+    if blob.startswith(RAW_MARKER):
+        return blob[1:]
+    if blob.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise RuntimeError("This blob is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return zlib.decompress(blob)
+
+
+def blob_path(user_folder, digest):
+    return os.path.join(user_folder, BLOB_DIR, digest[:2], digest)
+
+
+def write_blob(user_folder, content):
+    """Store the content once under its hash and return the hash."""
+    digest = content_hash(content)
+    path = blob_path(user_folder, digest)
+    if not os.path.exists(path):  # Identical text is already stored, nothing to write
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A temp file of its own, since an import and a save may write the same text at once
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix=".tmp", delete=False) as f:
+            f.write(compress(content.encode("utf-8")))
+        os.replace(f.name, path)
+    return digest
+
+
+@lru_cache(maxsize=4096)
+def read_blob(user_folder, digest):
+    """Return the text stored under a hash. Blobs never change, so reads are cached."""
+    with open(blob_path(user_folder, digest), "rb") as f:
+        return decompress(f.read()).decode("utf-8")
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def load_records(user_folder, filename=METADATA_FILE):
+    """Load entry records as stored, with ``content_hash`` instead of the content."""
+    path = os.path.join(user_folder, filename)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def load_entries(user_folder, filename=METADATA_FILE):
+    """Load entry records and resolve their content from the blob store."""
+    entries = []
+    for record in load_records(user_folder, filename):
+        entry = dict(record)
+        if "content" not in entry:  # Legacy records still carry their text inline
+            entry["content"] = read_blob(user_folder, entry["content_hash"])
+        entries.append(entry)
+    return entries
+
+
+def save_entries(user_folder, entries, filename=METADATA_FILE):
+    """Write entry records, moving each entry's content into the blob store."""
+    os.makedirs(user_folder, exist_ok=True)
+    records = []
+    for entry in entries:
+        record = {key: value for key, value in entry.items() if key != "content"}
+        if "content" in entry:
+            record["content_hash"] = write_blob(user_folder, entry["content"])
+        records.append(record)
+    _write_json(os.path.join(user_folder, filename), records)
+
+
+def entry_lock(user_folder):
+    """Return the lock that serializes read-modify-write cycles on a user's entry files."""
+    key = os.path.abspath(user_folder)
+    with _folder_locks_lock:
+        return _folder_locks.setdefault(key, threading.RLock())
+
+
+def update_entries(user_folder, update, filename=METADATA_FILE):
+    """Apply ``update`` to the stored records under the user's lock, save and return the result.
+
+    ``update`` gets the current records (with ``content_hash`` instead of the content)
+    and returns the new list; new records may carry ``content``, which is moved to the
+    blob store. Because the records are re-read under the lock, concurrent updates,
+    such as background enrichment and the user's own saves, never overwrite each other.
+    """
+    with entry_lock(user_folder):
+        records = update(load_records(user_folder, filename))
+        save_entries(user_folder, records, filename)
+        return records
+
+
+def referenced_hashes(user_folder):
+    hashes = set()
+    for filename in (METADATA_FILE, TRASH_FILE):
+        path = os.path.join(user_folder, filename)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                hashes.update(r["content_hash"] for r in json.load(f) if "content_hash" in r)
+    return hashes
+
+
+def collect_garbage(user_folder):
+    """Delete blobs no longer referenced by the metadata or the trash. Returns the number removed."""
+    blob_root = os.path.join(user_folder, BLOB_DIR)
+    if not os.path.isdir(blob_root):
+        return 0
+    removed = 0
+    with entry_lock(user_folder):  # A save in progress may have written a blob it doesn't reference yet
+        keep = referenced_hashes(user_folder)
+        for root, _, files in os.walk(blob_root):
+            for name in files:
+                if name not in keep:
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+    return removed
+
+
+def storage_report(journal_root=JOURNAL_ROOT, migrate=False):
+    """Compare bytes per entry for inline ``indent=4`` JSON and the blob store.
+
+    Sizes are apparent file sizes. With ``migrate=True`` each user's metadata and
+    trash are also rewritten into the blob store.
+    """
+    rows = []
+    for user_id in sorted(os.listdir(journal_root)):
+        user_folder = os.path.join(journal_root, user_id)
+        if not os.path.isdir(user_folder):
+            continue
+        files = {name: load_entries(user_folder, name) for name in (METADATA_FILE, TRASH_FILE)}
+        count = sum(len(entries) for entries in files.values())
+        if not count:
+            continue
+
+        before = 0
+        after = 0
+        blobs = {}
+        for entries in files.values():
+            inline = [{k: v for k, v in entry.items() if k != "content_hash"} for entry in entries]
+            before += len(json.dumps(inline, indent=4).encode("utf-8"))
+            records = []
+            for entry in inline:
+                digest = content_hash(entry["content"])
+                if digest not in blobs:
+                    blobs[digest] = len(compress(entry["content"].encode("utf-8")))
+                records.append({**{k: v for k, v in entry.items() if k != "content"}, "content_hash": digest})
+            after += len(json.dumps(records, separators=(",", ":")).encode("utf-8"))
+        after += sum(blobs.values())
+        rows.append((user_id, count, before, after))
+
+        if migrate:
+            for name, entries in files.items():
+                if os.path.exists(os.path.join(user_folder, name)):
+                    save_entries(user_folder, entries, name)
+    return rows
+
+
+if __name__ == "__main__":
+    # python entry_store.py [--migrate] [journal_root]
+    args = sys.argv[1:]
+    migrate = "--migrate" in args
+    args = [a for a in args if a != "--migrate"]
+    root = args[0] if args else JOURNAL_ROOT
+
+    rows = storage_report(root, migrate=migrate)
+    print(f"{'user':<38} {'entries':>7} {'before/entry':>13} {'after/entry':>12}")
+    for user_id, count, before, after in rows:
+        print(f"{user_id:<38} {count:>7} {before / count:>13.1f} {after / count:>12.1f}")
+    if rows:
+        count = sum(r[1] for r in rows)
+        print(f"{'total':<38} {count:>7} {sum(r[2] for r in rows) / count:>13.1f} {sum(r[3] for r in rows) / count:>12.1f}")
+    if not migrate:
+        print("Run with --migrate to rewrite the journals into the blob store.")
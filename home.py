@@ -9,16 +9,24 @@ import uuid
 import zipfile
 import io
 import textwrap
+from functools import partial
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
-from textblob import TextBlob
 import pickle
 import base64
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from email.mime.text import MIMEText
-import webview
+from entry_store import (METADATA_FILE, TRASH_FILE, load_entries, save_entries, update_entries,
+                         entry_lock, collect_garbage)
+from entry_import import IMPORT_FORMATS, detect_format, import_entries
+from sentiment import analyze_sentiment
+from downloads import entry_text, metadata_payload
+import model_warmup
+import model_router
+import journal_index
+import enrichment_queue
 
 # Scopes required for sending email
 SCOPES = ['https://www.googleapis.com/auth/gmail.send']
@@ -90,17 +98,6 @@ def create_zip_file(user_folder):
     zip_buffer.seek(0)  # Reset buffer pointer
     return zip_buffer
 
-def analyze_sentiment(entry):
-    blob = TextBlob(entry)
-    polarity = blob.sentiment.polarity
-    if polarity > 0:
-        return "Positive", polarity
-    elif polarity < 0:
-        return "Negative", polarity
-    else:
-        return "Neutral", polarity
-
-
 def authenticate_gmail():
     """Authenticate the user and return the Gmail service object."""
     creds = None
@@ -315,6 +312,11 @@ if "primary_color" not in st.session_state:
 
 load_preferences()
 
+# Start loading the AI models in the background so the first Gratitude AI answer doesn't wait for them
+for routed_model in model_router.model_names():
+    model_warmup.start(routed_model)
+enrichment_queue.start()  # Works through entries queued for enrichment, including from earlier runs
+
 with st.sidebar:
     st.header("Customize Theme")
     theme = st.radio("Choose Theme:", ["Light", "Dark"], index=0 if st.session_state["theme"] == "Light" else 1)
@@ -454,18 +456,12 @@ if st.session_state["logged_in"]:
                     "timestamp": timestamp,
                     "content": journal_entry.strip(),
                     "sentiment": sentiment,
+                    "polarity": polarity,
                 }
 
-                metadata_file = os.path.join(user_folder, "metadata.json")
-                if os.path.exists(metadata_file):
-                    with open(metadata_file, "r") as f:
-                        entries = json.load(f)
-                else:
-                    entries = []
-
-                entries.append(metadata)
-                with open(metadata_file, "w") as f:
-                    json.dump(entries, f, indent=4)
+                update_entries(user_folder, lambda records: records + [metadata])
+                journal_index.schedule_sync(user_folder)  # Embedded in the background for Gratitude AI
+                enrichment_queue.enqueue_missing(user_folder)  # Themes, emotions and a summary, added later
 
             success_placeholder.success(f"Your entry '{metadata['title']}' has been saved.")
             time.sleep(3)
@@ -473,6 +469,30 @@ if st.session_state["logged_in"]:
             st.info(f"Sentiment Analysis Result: {sentiment}")
         else:
             st.warning("Please write something before saving!")
+
+    # Bulk import from other journaling tools or a previous export
+    with st.expander("Import entries"):
+        uploaded_file = st.file_uploader(
+            "Upload a JSONL, CSV, metadata JSON or exported ZIP file",
+            type=IMPORT_FORMATS + ["ndjson"],
+            key="import_file"
+        )
+        if uploaded_file and st.button("Import entries", key="importing_entries"):
+            progress_bar = st.progress(0.0, text="Importing entries...")
+
+            def show_import_progress(count, fraction):
+                progress_bar.progress(fraction if fraction is not None else 0.0, text=f"Imported {count} entries...")
+
+            try:
+                imported, skipped = import_entries(user_folder, uploaded_file, detect_format(uploaded_file.name),
+                                                   progress=show_import_progress)
+                journal_index.schedule_sync(user_folder)
+                enrichment_queue.enqueue_missing(user_folder)
+                success_placeholder.success(f"Imported {imported} entries ({skipped} skipped).")
+                time.sleep(3)
+                success_placeholder.empty()
+            except (ValueError, KeyError, UnicodeDecodeError, zipfile.BadZipFile) as e:
+                st.error(f"Failed to import entries: {e}")
 else:
     st.warning("Please log in before using")
 
@@ -485,21 +505,26 @@ if st.session_state.get("logged_in", False):
         st.session_state["current_user"] = None
         st.stop()
     user_folder = os.path.join("journal_entries", user_id)
-    metadata_file = os.path.join(user_folder, "metadata.json")
-    trash_file = os.path.join(user_folder, "trash.json")
+    metadata_file = os.path.join(user_folder, METADATA_FILE)
+    trash_file = os.path.join(user_folder, TRASH_FILE)
     with st.spinner("Loading your entries..."):
         st.subheader("Your Journal Entries")
         if os.path.exists(metadata_file):
-            with open(metadata_file, "r") as f:
-                entries = json.load(f)
+            entries = load_entries(user_folder)
 
             if entries:
-                # Download metadata as JSON
+                failed_enrichment = enrichment_queue.failed_jobs(user_folder)
+                if failed_enrichment and st.button(f"Retry enrichment for {len(failed_enrichment)} entries",
+                                                   key="retry_enrichment"):
+                    enrichment_queue.retry_failed(user_folder)
+
+                # Download metadata as JSON, only serialized when the button is clicked
+                compress_metadata = st.checkbox("Compress metadata download (gzip)", key="metadata_gzip")
                 st.download_button(
                     label="Download metadata",
-                    data=json.dumps(entries, indent=4),
-                    file_name="metadata.json",
-                    mime="application/json",
+                    data=partial(metadata_payload, entries, compress_metadata),
+                    file_name="metadata.json.gz" if compress_metadata else "metadata.json",
+                    mime="application/gzip" if compress_metadata else "application/json",
                     key="metadata_download"
                 )
 
@@ -532,6 +557,11 @@ if st.session_state.get("logged_in", False):
                             st.write(entry["content"])
                             sentiment = entry.get("sentiment", "Unknown") # This is used to handle missing keys
                             st.info(f"Sentiment: {sentiment}")
+                            enrichment = entry.get("enrichment")
+                            if enrichment:
+                                st.caption(f"Emotions: {', '.join(enrichment['emotions']) or '-'} · "
+                                           f"Themes: {', '.join(enrichment['themes']) or '-'}")
+                                st.caption(f"Summary: {enrichment['summary']}")
 
                             recipient_email = st.text_input(f"Recipient Email for '{entry['title']}'", placeholder="Enter recipient email", key=f"email_input_{entry['id']}")
 
@@ -558,46 +588,40 @@ if st.session_state.get("logged_in", False):
                                         st.error(f"Failed to send email for '{entry['title']}': {e}")
 
                             # Download as .txt
-                            txt_content = f"Title: {entry['title']}\nDate: {entry['timestamp']}\n\n{entry['content']}"
                             st.download_button(
                                 label="Download as .txt",
-                                data=txt_content,
+                                data=partial(entry_text, entry),
                                 file_name=f"{entry['title']}.txt",
                                 mime="text/plain",
                                 key=f"txt_{entry['id']}"
                             )
 
-                            # Download as .pdf
-                            pdf_buffer = generate_pdf(entry['title'], entry['timestamp'], entry['content'])
+                            # Download as .pdf, rendered only when clicked
                             st.download_button(
                                 label="Download as .pdf",
-                                data=pdf_buffer,
+                                data=partial(generate_pdf, entry['title'], entry['timestamp'], entry['content']),
                                 file_name=f"{entry['title']}.pdf",
                                 mime="application/pdf",
                                 key=f"pdf_{entry['id']}"
                             )
                 if selected_entries:
                     if st.button("Move selected entries to trash", key="move_to_trash"):
-                        if os.path.exists(trash_file):
-                            with open(metadata_file, "w") as f:
-                                json.dump(entries, f, indent=4)
-                        else:
-                            trashed_entries = []
+                        with entry_lock(user_folder):  # Re-read, so background updates aren't overwritten
+                            entries = load_entries(user_folder)
+                            trashed_entries = load_entries(user_folder, TRASH_FILE)
 
-                        trashed_entries.extend([e for e in entries if e["id"] in selected_entries])
-                        entries = [e for e in entries if e["id"] not in selected_entries]
+                            trashed_entries.extend([e for e in entries if e["id"] in selected_entries])
+                            entries = [e for e in entries if e["id"] not in selected_entries]
 
-                        with open(metadata_file, "w") as f:
-                            json.dump(entries, f, indent=4)
-                        with open(trash_file, "w") as f:
-                            json.dump(trashed_entries, f, indent=4)
+                            save_entries(user_folder, entries)
+                            save_entries(user_folder, trashed_entries, TRASH_FILE)
+                        journal_index.schedule_sync(user_folder)
 
                         success_placeholder.success(f"Deleted {len(selected_entries)} entries successfully")
                         time.sleep(3)
                         success_placeholder.empty()
                 if os.path.exists(trash_file):
-                    with open(trash_file, "r") as f:
-                        trashed_entries = json.load(f)
+                    trashed_entries = load_entries(user_folder, TRASH_FILE)
 
                     if trashed_entries:
                         st.subheader("🗑️ Trash Bin")
@@ -647,33 +671,34 @@ if st.session_state.get("logged_in", False):
                                                 st.error(f"Failed to send email for '{entry['title']}': {e}")
 
                                     # Download as .txt
-                                    txt_content = f"Title: {entry['title']}\nDate: {entry['timestamp']}\n\n{entry['content']}"
                                     st.download_button(
                                         label="Download as .txt",
-                                        data=txt_content,
+                                        data=partial(entry_text, entry),
                                         file_name=f"{entry['title']}.txt",
                                         mime="text/plain",
                                         key=f"txt_{entry['id']}"
                                     )
 
-                                    # Download as .pdf
-                                    pdf_buffer = generate_pdf(entry['title'], entry['timestamp'], entry['content'])
+                                    # Download as .pdf, rendered only when clicked
                                     st.download_button(
                                         label="Download as .pdf",
-                                        data=pdf_buffer,
+                                        data=partial(generate_pdf, entry['title'], entry['timestamp'], entry['content']),
                                         file_name=f"{entry['title']}.pdf",
                                         mime="application/pdf",
                                         key=f"pdf_{entry['id']}"
                                     )
                         if selected_trash:
                             if st.button("Restore Selected Entries", key="restore_entries"):
-                                entries.extend([e for e in trashed_entries if e["id"] in selected_trash])
-                                trashed_entries = [e for e in trashed_entries if e["id"] not in selected_trash]
+                                with entry_lock(user_folder):
+                                    entries = load_entries(user_folder)
+                                    trashed_entries = load_entries(user_folder, TRASH_FILE)
+
+                                    entries.extend([e for e in trashed_entries if e["id"] in selected_trash])
+                                    trashed_entries = [e for e in trashed_entries if e["id"] not in selected_trash]
 
-                                with open(metadata_file, "w") as f:
-                                    json.dump(entries, f, indent=4)
-                                with open(trash_file, "w") as f:
-                                    json.dump(trashed_entries, f, indent=4)
+                                    save_entries(user_folder, entries)
+                                    save_entries(user_folder, trashed_entries, TRASH_FILE)
+                                journal_index.schedule_sync(user_folder)
 
                                 success_placeholder.success(f"Restored {len(selected_trash)} entries!")
                                 time.sleep(3)
@@ -681,10 +706,9 @@ if st.session_state.get("logged_in", False):
 
                         if selected_trash:
                             if st.button("Permanently Delete Selected Entries", key="delete_permanently"):
-                                trashed_entries = [e for e in trashed_entries if e["id"] not in selected_trash]
-
-                                with open(trash_file, "w") as f:
-                                    json.dump(trashed_entries, f, indent=4)
+                                update_entries(user_folder, lambda records: [
+                                    r for r in records if r["id"] not in selected_trash], TRASH_FILE)
+                                collect_garbage(user_folder)  # Drop blobs nothing refers to anymore
 
                                 success_placeholder.success(f"Permanently deleted {len(selected_trash)} entries!")
                                 time.sleep(3)
@@ -753,6 +777,3 @@ if st.session_state.get("logged_in", False):
                     success_placeholder.empty()
             except Exception as e:
                 st.error(f"Failed to send email: {e}")
-
-webview.create_window("Streamlit App", "http://localhost:8501")
-webview.start()
@@ -0,0 +1,318 @@
+import os
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+import entry_store
+from entry_store import INDEX_DIR
+from ollama_client import EMBED_MODEL, embed
+
+INDEX_FILE = "index.json"  # Which entry each vector row belongs to
+VECTORS_FILE = "vectors.npy"  # Normalized float32 embeddings, one row per entry, memory-mapped
+ASSIGNMENTS_FILE = "assignments.npy"  # IVF list of each row
+CENTROIDS_FILE = "centroids.npy"
+
+RETRIEVE_TOP_K = int(os.environ.get("JOURNAL_TOP_K", "3"))
+MIN_SCORE = float(os.environ.get("JOURNAL_MIN_SCORE", "0.3"))  # Cosine similarity below which entries aren't used
+SNIPPET_CHARS = 400  # Characters of each retrieved entry put into the prompt
+EMBED_BATCH = 32
+EMBED_MAX_CHARS = 2000
+
+IVF_MIN_ROWS = 10000  # Below this a brute-force scan takes only a few milliseconds
+IVF_PROBES = 16  # Lists searched per query
+IVF_TRAIN_SAMPLE = 40  # Rows sampled per list to train the centroids
+IVF_ITERATIONS = 8
+
+_sync_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal-index")
+_syncs_queued = set()
+_locks_lock = threading.Lock()
+_locks = {}  # user folder -> lock for its index files and cached maps
+_cache = {}  # user folder -> loaded index, see _load()
+
+
+def index_path(user_folder, filename):
+    return os.path.join(user_folder, INDEX_DIR, filename)
+
+
+def _lock(user_folder):
+    with _locks_lock:
+        return _locks.setdefault(user_folder, threading.RLock())
+
+
+def _load(user_folder):
+    """Return the user's index, or None if there is none yet. Called with the user's lock held.
+
+    The vectors and list assignments are memory-mapped, so only the rows a query
+    touches are read from disk. The result is cached until index.json changes.
+    """
+    path = index_path(user_folder, INDEX_FILE)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    index = _cache.get(user_folder)
+    if index is not None and index["mtime"] == mtime:
+        return index
+
+    with open(path, "r") as f:
+        meta = json.load(f)
+    index = {
+        "mtime": mtime,
+        "meta": meta,
+        "vectors": np.load(index_path(user_folder, VECTORS_FILE), mmap_mode="r+"),
+        "assignments": np.load(index_path(user_folder, ASSIGNMENTS_FILE), mmap_mode="r+"),
+        "centroids": None,
+        "lists": None,
+    }
+    if meta["trained"]:
+        index["centroids"] = np.load(index_path(user_folder, CENTROIDS_FILE))
+        # Inverted lists: the rows of list c are order[bounds[c]:bounds[c + 1]]
+        assignments = index["assignments"][:meta["count"]]
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(index["centroids"]) + 1))
+        index["lists"] = (order, bounds)
+    _cache[user_folder] = index
+    return index
+
+
+def _save_meta(user_folder, meta):
+    path = index_path(user_folder, INDEX_FILE)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(meta, f, separators=(",", ":"))
+    os.replace(f"{path}.tmp", path)
+    _cache.pop(user_folder, None)  # The next _load re-reads the rows and rebuilds the lists
+
+
+def _create(user_folder, dim, capacity=1024):
+    os.makedirs(os.path.join(user_folder, INDEX_DIR), exist_ok=True)
+    _cache.pop(user_folder, None)
+    np.lib.format.open_memmap(index_path(user_folder, VECTORS_FILE), "w+", np.float32, (capacity, dim)).flush()
+    np.lib.format.open_memmap(index_path(user_folder, ASSIGNMENTS_FILE), "w+", np.int32, (capacity,)).flush()
+    _save_meta(user_folder, {"model": EMBED_MODEL, "dim": dim, "count": 0, "trained": 0, "rows": []})
+
+
+def _grow(user_folder, capacity):
+    # Copies both arrays into files with room for ``capacity`` rows. Called with the
+    # user's lock held.
+    index = _cache.pop(user_folder)
+    for filename, key in ((VECTORS_FILE, "vectors"), (ASSIGNMENTS_FILE, "assignments")):
+        old = index.pop(key)
+        tmp_path = index_path(user_folder, f"{filename}.tmp")
+        new = np.lib.format.open_memmap(tmp_path, "w+", old.dtype, (capacity,) + old.shape[1:])
+        new[:len(old)] = old
+        new.flush()
+        del new, old  # Unmapped first, since a mapped file can't be replaced on Windows
+        os.replace(tmp_path, index_path(user_folder, filename))
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def entry_text(record, user_folder):
+    content = record["content"] if "content" in record else entry_store.read_blob(user_folder, record["content_hash"])
+    return f"{record.get('title', '')}\n{content}"[:EMBED_MAX_CHARS]
+
+
+def sync(user_folder):
+    """Bring the user's index in line with their entries and return (added, removed).
+
+    Only entries that are new or whose content changed are embedded, in batches;
+    rows of entries that were deleted (or moved to the trash) are dropped. The
+    index is rebuilt from scratch when the embedding model changes.
+    """
+    records = {}
+    for record in entry_store.load_records(user_folder):
+        digest = record.get("content_hash") or entry_store.content_hash(record.get("content", ""))
+        records[record["id"]] = (digest, record)
+
+    lock = _lock(user_folder)
+    with lock:
+        index = _load(user_folder)
+        rebuild = index is None or index["meta"]["model"] != EMBED_MODEL  # Other models' vectors aren't comparable
+        indexed = {} if rebuild else {row[0]: row[1] for row in index["meta"]["rows"]}
+        removed = _remove(user_folder, [entry_id for entry_id, digest in indexed.items()
+                                        if entry_id not in records or records[entry_id][0] != digest])
+
+    missing = [(entry_id, digest, record) for entry_id, (digest, record) in records.items()
+               if indexed.get(entry_id) != digest]
+    for start in range(0, len(missing), EMBED_BATCH):
+        batch = missing[start:start + EMBED_BATCH]
+        # Embedding is the slow part, so it runs without holding the lock
+        vectors = _normalize(embed([entry_text(record, user_folder) for _, _, record in batch]))
+        with lock:
+            if rebuild:
+                _create(user_folder, vectors.shape[1])
+                rebuild = False
+            _append(user_folder, batch, vectors)
+
+    with lock:
+        index = _load(user_folder)
+        if index is not None and index["meta"]["count"] >= IVF_MIN_ROWS \
+                and index["meta"]["count"] > 2 * index["meta"]["trained"]:
+            _train(user_folder, index)  # Retrained whenever the index has doubled since the last time
+    return len(missing), removed
+
+
+def _remove(user_folder, entry_ids):
+    # Called with the user's lock held. The last row moves into each freed slot.
+    if not entry_ids:
+        return 0
+    index = _load(user_folder)
+    meta = index["meta"]
+    positions = {row[0]: position for position, row in enumerate(meta["rows"])}
+    for entry_id in entry_ids:
+        position = positions.pop(entry_id)
+        last = meta["count"] - 1
+        if position != last:
+            index["vectors"][position] = index["vectors"][last]
+            index["assignments"][position] = index["assignments"][last]
+            meta["rows"][position] = meta["rows"][last]
+            positions[meta["rows"][position][0]] = position
+        meta["rows"].pop()
+        meta["count"] = last
+    index["vectors"].flush()
+    index["assignments"].flush()
+    _save_meta(user_folder, meta)
+    return len(entry_ids)
+
+
+def _append(user_folder, batch, vectors):
+    # Called with the user's lock held
+    index = _load(user_folder)
+    count = index["meta"]["count"]
+    if count + len(batch) > len(index["vectors"]):
+        _grow(user_folder, max(count + len(batch), 2 * len(index["vectors"])))
+        index = _load(user_folder)
+    meta = index["meta"]
+    index["vectors"][count:count + len(batch)] = vectors
+    if index["centroids"] is not None:  # New rows join the list of their nearest centroid
+        index["assignments"][count:count + len(batch)] = np.argmax(vectors @ index["centroids"].T, axis=1)
+    index["vectors"].flush()
+    index["assignments"].flush()
+    meta["rows"].extend([entry_id, digest, record.get("title", ""), record.get("timestamp", "")]
+                        for entry_id, digest, record in batch)
+    meta["count"] = count + len(batch)
+    _save_meta(user_folder, meta)
+
+
+def _train(user_folder, index):
+    """Cluster the vectors into about sqrt(n) lists with spherical k-means (IVF)."""
+    count = index["meta"]["count"]
+    lists = int(np.sqrt(count))
+    rng = np.random.default_rng(0)
+    sample = index["vectors"][np.sort(rng.choice(count, min(count, lists * IVF_TRAIN_SAMPLE), replace=False))]
+    centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+    for _ in range(IVF_ITERATIONS):
+        nearest = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, nearest, sample)
+        filled = np.bincount(nearest, minlength=lists) > 0
+        centroids[filled] = _normalize(sums[filled])  # Empty lists keep their old centroid
+
+    for start in range(0, count, 8192):
+        stop = min(count, start + 8192)
+        index["assignments"][start:stop] = np.argmax(index["vectors"][start:stop] @ centroids.T, axis=1)
+    index["assignments"].flush()
+    np.save(index_path(user_folder, CENTROIDS_FILE), centroids)
+    index["meta"]["trained"] = count
+    _save_meta(user_folder, index["meta"])
+
+
+def search(user_folder, vector, k=RETRIEVE_TOP_K):
+    """Return up to ``k`` ``(row, score)`` pairs for the entries most similar to ``vector``.
+
+    ``row`` is ``[entry id, content hash, title, timestamp]``. Small indexes are
+    scanned in full; from IVF_MIN_ROWS rows on, only the IVF_PROBES lists whose
+    centroids are closest to the query are scanned.
+    """
+    query = _normalize(vector)
+    with _lock(user_folder):
+        index = _load(user_folder)
+        if index is None or index["meta"]["count"] == 0 or len(query) != index["meta"]["dim"]:
+            return []
+        count = index["meta"]["count"]
+        if index["lists"] is not None:
+            order, bounds = index["lists"]
+            probes = np.argsort(index["centroids"] @ query)[-IVF_PROBES:]
+            candidates = np.sort(np.concatenate([order[bounds[c]:bounds[c + 1]] for c in probes]))
+            scores = index["vectors"][candidates] @ query
+        else:
+            candidates = None
+            scores = index["vectors"][:count] @ query
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        rows = index["meta"]["rows"]
+        return [(rows[candidates[i] if candidates is not None else i], float(scores[i])) for i in best]
+
+
+def retrieve(user_folder, prompt, k=RETRIEVE_TOP_K, min_score=MIN_SCORE):
+    """Return the text of the user's entries most relevant to ``prompt``, formatted for the prompt.
+
+    Returns an empty string when nothing is similar enough, or when the index or
+    the embedding model isn't available, so answering never depends on it.
+    """
+    if not os.path.exists(index_path(user_folder, INDEX_FILE)):
+        return ""
+    try:
+        vector = embed([prompt])[0]
+    except (requests.exceptions.RequestException, KeyError) as e:
+        print(f"Journal retrieval skipped: {e}")
+        return ""
+    lines = []
+    inline = None  # Text of legacy entries, which isn't in the blob store yet; read once if needed
+    for (entry_id, digest, title, timestamp), score in search(user_folder, vector, k):
+        if score < min_score:
+            continue
+        try:
+            content = entry_store.read_blob(user_folder, digest)
+        except FileNotFoundError:
+            if inline is None:
+                inline = {record["id"]: record["content"] for record in entry_store.load_records(user_folder)
+                          if "content" in record}
+            content = inline.get(entry_id)
+            if content is None:
+                continue  # Deleted since the index was last synced
+        snippet = " ".join(content.split())[:SNIPPET_CHARS]
+        lines.append(f"- {timestamp} \"{title}\": {snippet}")
+    if not lines:
+        return ""
+    return "Entries from the user's own journal that may be relevant:\n" + "\n".join(lines)
+
+
+def schedule_sync(user_folder):
+    """Update the user's index on the background worker; cheap to call after every change."""
+    with _locks_lock:
+        if user_folder in _syncs_queued:
+            return  # A queued sync will see this change too
+        _syncs_queued.add(user_folder)
+    _sync_executor.submit(_run_sync, user_folder)
+
+
+def _run_sync(user_folder):
+    with _locks_lock:
+        _syncs_queued.discard(user_folder)
+    try:
+        sync(user_folder)
+    except Exception as e:
+        print(f"Failed to update the journal index for {user_folder}: {e}")
+
+
+if __name__ == "__main__":
+    # python journal_index.py [root]: build or update the index of every user
+    root = sys.argv[1] if len(sys.argv) > 1 else entry_store.JOURNAL_ROOT
+    for user_id in sorted(os.listdir(root)):
+        user_folder = os.path.join(root, user_id)
+        if os.path.isdir(user_folder):
+            started = time.perf_counter()
+            added, removed = sync(user_folder)
+            print(f"{user_id}: {added} embedded, {removed} removed in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,65 @@
+import sys
+import time
+import argparse
+import subprocess
+
+import requests
+import webview
+
+APP_SCRIPT = "home.py"
+PORT = 8501
+WINDOW_TITLE = "Streamlit App"
+STARTUP_TIMEOUT = 60  # Seconds to wait for the server to answer its health check
+HEALTH_POLL_INTERVAL = 0.25
+SHUTDOWN_TIMEOUT = 10
+
+
+def start_server(script=APP_SCRIPT, port=PORT):
+    """Start the Streamlit server in its own process. Headless, so it doesn't open a browser tab."""
+    return subprocess.Popen([sys.executable, "-m", "streamlit", "run", script,
+                             "--server.port", str(port), "--server.headless", "true"])
+
+
+def wait_until_ready(server, url, timeout=STARTUP_TIMEOUT):
+    """Poll Streamlit's health endpoint until it answers, the server exits or ``timeout`` passes."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Streamlit exited with code {server.returncode} before it was ready")
+        try:
+            if requests.get(f"{url}/_stcore/health", timeout=1).ok:
+                return
+        except requests.exceptions.RequestException:
+            pass  # Not listening yet
+        time.sleep(HEALTH_POLL_INTERVAL)
+    raise TimeoutError(f"Streamlit did not become ready at {url} within {timeout}s")
+
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(SHUTDOWN_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start the app's Streamlit server and open it in a desktop window.")
+    parser.add_argument("--script", default=APP_SCRIPT)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--title", default=WINDOW_TITLE)
+    args = parser.parse_args()
+
+    url = f"http://localhost:{args.port}"
+    server = start_server(args.script, args.port)
+    try:
+        wait_until_ready(server, url)
+        # The one and only window; closing it ends the app
+        webview.create_window(args.title, url)
+        webview.start()
+    finally:
+        stop_server(server)
+
+
+if __name__ == "__main__":
+    main()
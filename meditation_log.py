@@ -0,0 +1,152 @@
+import os
+import sys
+import json
+import time
+import threading
+from datetime import date, datetime, timedelta
+
+MEDITATION_LOG_DIR = "meditation_log"
+
+_write_lock = threading.Lock()
+
+
+def log_path(user_id):
+    return os.path.join(MEDITATION_LOG_DIR, f"{user_id}.jsonl")
+
+
+def stats_path(user_id):
+    return os.path.join(MEDITATION_LOG_DIR, f"{user_id}.stats.json")
+
+
+def _empty_stats():
+    return {
+        "offset": 0,  # Bytes of the log already counted in these stats
+        "sessions": 0,
+        "seconds": 0,
+        "days": {},  # "YYYY-MM-DD" -> {"sessions": n, "seconds": n}
+        "weeks": {},  # ISO week, "YYYY-Www" -> {"sessions": n, "seconds": n}
+        "last_day": None,  # Latest day with a session, for the streak
+        "streak": 0,  # Consecutive days with a session, ending on last_day
+        "best_streak": 0,
+        "course_progress": 0,
+    }
+
+
+def _week(day):
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02}"
+
+
+def _apply(stats, event):
+    """Add one log event to the rollups."""
+    if event.get("type") == "course":
+        stats["course_progress"] = event["progress"]
+        return
+    if event.get("type") != "session":
+        return
+    day = datetime.fromtimestamp(event["timestamp"]).date()
+    stats["sessions"] += 1
+    stats["seconds"] += event["seconds"]
+    for rollup, key in ((stats["days"], day.isoformat()), (stats["weeks"], _week(day))):
+        totals = rollup.setdefault(key, {"sessions": 0, "seconds": 0})
+        totals["sessions"] += 1
+        totals["seconds"] += event["seconds"]
+
+    last_day = date.fromisoformat(stats["last_day"]) if stats["last_day"] else None
+    if last_day is None or day > last_day:
+        stats["streak"] = stats["streak"] + 1 if last_day == day - timedelta(days=1) else 1
+        stats["last_day"] = day.isoformat()
+        stats["best_streak"] = max(stats["best_streak"], stats["streak"])
+
+
+def _catch_up(user_id, stats):
+    """Apply the log lines written after ``stats["offset"]``; usually there are none."""
+    path = log_path(user_id)
+    if not os.path.exists(path) or os.path.getsize(path) <= stats["offset"]:
+        return stats
+    with open(path, "rb") as f:
+        f.seek(stats["offset"])
+        data = f.read()
+    end = data.rfind(b"\n") + 1  # Leave a line that is still being written for next time
+    for line in data[:end].split(b"\n"):
+        if line.strip():
+            try:
+                _apply(stats, json.loads(line))
+            except (json.JSONDecodeError, KeyError):
+                continue  # Skip a torn or corrupted line
+    stats["offset"] += end
+    return stats
+
+
+def _load_stats(user_id):
+    try:
+        with open(stats_path(user_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return _empty_stats()  # Rebuilt from the log by _catch_up
+
+
+def _save_stats(user_id, stats):
+    tmp_path = f"{stats_path(user_id)}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(stats, f)
+    os.replace(tmp_path, stats_path(user_id))
+
+
+def _append(user_id, event):
+    """Append an event to the user's log and fold it into the saved rollups."""
+    os.makedirs(MEDITATION_LOG_DIR, exist_ok=True)
+    line = json.dumps(event, ensure_ascii=False) + "\n"
+    with _write_lock:
+        with open(log_path(user_id), "a", encoding="utf-8") as f:
+            f.write(line)
+        _save_stats(user_id, _catch_up(user_id, _load_stats(user_id)))
+
+
+def record_session(user_id, kind, seconds, timestamp=None):
+    """Log a completed session (``kind`` is e.g. "timer" or the breathing program) of ``seconds``."""
+    _append(user_id, {"type": "session", "kind": kind, "seconds": int(seconds),
+                      "timestamp": timestamp or time.time()})
+
+
+def set_course_progress(user_id, progress):
+    _append(user_id, {"type": "course", "progress": progress, "timestamp": time.time()})
+
+
+def stats(user_id, today=None):
+    """Return the user's rollups, plus ``current_streak``, ``today`` and ``this_week`` totals.
+
+    Only log lines written since the rollups were last saved are read, so this
+    doesn't depend on the length of the history.
+    """
+    with _write_lock:
+        result = _catch_up(user_id, _load_stats(user_id))
+    today = today or date.today()
+    last_day = date.fromisoformat(result["last_day"]) if result["last_day"] else None
+    # The streak is still alive today if there was a session yesterday
+    alive = last_day is not None and last_day >= today - timedelta(days=1)
+    result["current_streak"] = result["streak"] if alive else 0
+    empty = {"sessions": 0, "seconds": 0}
+    result["today"] = result["days"].get(today.isoformat(), empty)
+    result["this_week"] = result["weeks"].get(_week(today), empty)
+    return result
+
+
+def rebuild(user_id):
+    """Recompute the rollups from the whole log, e.g. after editing it by hand."""
+    with _write_lock:
+        rebuilt = _catch_up(user_id, _empty_stats())
+        _save_stats(user_id, rebuilt)
+    return rebuilt
+
+
+if __name__ == "__main__":
+    # python meditation_log.py [--rebuild] user_id...: print (or recompute) users' meditation stats
+    rebuild_stats = "--rebuild" in sys.argv
+    for user_id in [arg for arg in sys.argv[1:] if arg != "--rebuild"]:
+        if rebuild_stats:
+            rebuild(user_id)
+        user_stats = stats(user_id)
+        print(f"{user_id}: {user_stats['sessions']} sessions, {user_stats['seconds'] / 60:.0f} minutes, "
+              f"streak {user_stats['current_streak']} days (best {user_stats['best_streak']}), "
+              f"{user_stats['this_week']['seconds'] / 60:.0f} minutes this week")
@@ -2,10 +2,11 @@ import streamlit as st
 import time
 import json
 import os
+import breathing
+import meditation_log
 from streamlit_extras import add_vertical_space
 from streamlit_extras.stylable_container import stylable_container
 from streamlit_extras.let_it_rain import rain
-import webview
 
 # Initialize theme settings in session_state
 if "theme" not in st.session_state:
@@ -17,8 +18,13 @@ if "primary_color" not in st.session_state:
 # Set Page Configuration
 st.set_page_config(page_title="Mindfulness Hub", page_icon="🧘")
 
+# Sessions and course progress are only remembered for a logged-in user
+user_id = st.session_state.get("user_id") if st.session_state.get("logged_in") else None
+
 # Create Tabs
-tab1, tab2 = st.tabs(["🕰️ Mindfulness Timer", "📚 Mindfulness Course"])
+tab1, tab2, tab3 = st.tabs(["🕰️ Mindfulness Timer", "🌬️ Guided Breathing", "📚 Mindfulness Course"])
+
+TIMER_CHECK_INTERVAL = 10  # Seconds between server-side checks of a running timer; the countdown ticks in the browser
 
 def save_preferences():
     preferences = {
@@ -133,6 +139,149 @@ def show_confetti():
         animation_length="5s",
     )
 
+def start_timer(minutes):
+    """Start a session by storing its deadline; nothing runs on the server while it ticks."""
+    st.session_state["timer_deadline"] = time.monotonic() + minutes * 60
+    st.session_state["timer_minutes"] = minutes
+
+
+def stop_timer():
+    st.session_state.pop("timer_deadline", None)
+
+
+def finish_timer_if_due():
+    """Mark the running session complete once its deadline has passed. Returns True if it just finished."""
+    deadline = st.session_state.get("timer_deadline")
+    if deadline is None or time.monotonic() < deadline:
+        return False
+    del st.session_state["timer_deadline"]
+    st.session_state["timer_completed"] = st.session_state["timer_minutes"]
+    if user_id:
+        meditation_log.record_session(user_id, "timer", st.session_state["timer_minutes"] * 60)
+    return True
+
+
+def countdown_html(remaining, text_color):
+    """A countdown to ``remaining`` seconds from now that ticks in the browser.
+
+    Each tick is scheduled for the next whole second before the deadline, so the
+    display doesn't drift however long rendering takes.
+    """
+    return f"""
+    <div id="countdown" style="font-family: sans-serif; font-size: 20px; color: {text_color};"></div>
+    <script>
+        const deadline = performance.now() + {remaining * 1000:.0f};
+        const display = document.getElementById("countdown");
+        function tick() {{
+            const left = Math.max(0, Math.ceil((deadline - performance.now()) / 1000));
+            const mins = String(Math.floor(left / 60)).padStart(2, "0");
+            const secs = String(left % 60).padStart(2, "0");
+            display.textContent = left > 0 ? `⏳ Time left: ${{mins}}:${{secs}}` : "✅ Time is up. Take a deep breath...";
+            if (left > 0) {{
+                setTimeout(tick, (deadline - performance.now()) % 1000 || 1000);
+            }}
+        }}
+        tick();
+    </script>
+    """
+
+
+@st.fragment(run_every=TIMER_CHECK_INTERVAL)
+def watch_timer():
+    """Check the deadline now and then, and rerun the page once the session is over."""
+    if finish_timer_if_due():
+        st.rerun()
+
+
+def start_breathing(program_name, cycles):
+    st.session_state["breathing_started"] = time.monotonic()
+    st.session_state["breathing_phases"] = breathing.timeline(breathing.PROGRAMS[program_name], cycles)
+    st.session_state["breathing_program"] = program_name
+
+
+def stop_breathing():
+    st.session_state.pop("breathing_started", None)
+
+
+def finish_breathing_if_due():
+    """Mark the breathing session complete once its last phase is over. Returns True if it just finished."""
+    started = st.session_state.get("breathing_started")
+    if started is None or not breathing.position(st.session_state["breathing_phases"],
+                                                 time.monotonic() - started)["done"]:
+        return False
+    del st.session_state["breathing_started"]
+    st.session_state["breathing_completed"] = st.session_state["breathing_program"]
+    if user_id:
+        meditation_log.record_session(user_id, st.session_state["breathing_program"],
+                                      breathing.duration(st.session_state["breathing_phases"]))
+    return True
+
+
+def breathing_html(phases, elapsed, text_color, primary_color):
+    """A breathing guide that grows on inhales and shrinks on exhales, animated in the browser.
+
+    Every frame looks up the current phase from the time since the session
+    started, the same way ``breathing.position`` does, so phase changes stay on
+    their absolute deadlines.
+    """
+    return f"""
+    <div style="display: flex; flex-direction: column; align-items: center; font-family: sans-serif;">
+        <div id="guide" style="width: 160px; height: 160px; border-radius: 50%; background: {primary_color};"></div>
+        <div id="label" style="margin-top: 16px; font-size: 22px; color: {text_color};"></div>
+    </div>
+    <script>
+        const phases = {json.dumps(phases)};
+        const started = performance.now() - {elapsed * 1000:.0f};
+        const guide = document.getElementById("guide");
+        const label = document.getElementById("label");
+        function frame() {{
+            const elapsed = (performance.now() - started) / 1000;
+            const phase = phases.findLast(phase => phase.start <= elapsed);
+            if (!phase || elapsed >= phase.start + phase.seconds) {{
+                label.textContent = "✅ Well done. Notice how you feel.";
+                guide.style.transform = "scale(0.6)";
+                return;
+            }}
+            const progress = (elapsed - phase.start) / phase.seconds;
+            const before = phases[phases.indexOf(phase) - 1];
+            const size = phase.action === "inhale" ? 0.6 + 0.4 * progress
+                : phase.action === "exhale" ? 1.0 - 0.4 * progress
+                : before && before.action === "inhale" ? 1.0 : 0.6;  // A hold keeps the size the last breath left
+            guide.style.transform = `scale(${{size}})`;
+            const left = Math.ceil(phase.start + phase.seconds - elapsed);
+            label.textContent = `${{phase.name}}... ${{left}}`;
+            requestAnimationFrame(frame);
+        }}
+        frame();
+    </script>
+    """
+
+
+def show_meditation_stats():
+    """Show the user's streak and totals from the pre-aggregated rollups."""
+    if not user_id:
+        st.caption("Log in on the Journal page to keep track of your sessions and streaks.")
+        return
+    stats = meditation_log.stats(user_id)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("🔥 Streak", f"{stats['current_streak']} days", help=f"Best: {stats['best_streak']} days")
+    col2.metric("Today", f"{stats['today']['seconds'] // 60} min")
+    col3.metric("This week", f"{stats['this_week']['seconds'] // 60} min")
+    col4.metric("All time", f"{stats['seconds'] // 60} min", help=f"{stats['sessions']} sessions")
+
+
+def save_course_progress():
+    """Remember the course progress for the logged-in user, so it survives a reload."""
+    if user_id:
+        meditation_log.set_course_progress(user_id, st.session_state["course_progress"])
+
+
+@st.fragment(run_every=TIMER_CHECK_INTERVAL)
+def watch_breathing():
+    if finish_breathing_if_due():
+        st.rerun()
+
+
 apply_theme(st.session_state["theme"], st.session_state["primary_color"])
 
 if "theme" not in st.session_state:
@@ -167,23 +316,51 @@ with tab1:
 
     # User input for timer duration
     minutes = st.slider("Select duration (minutes)", 1, 30, 5)
-    seconds = minutes * 60
-
-    # Start button
-    if st.button("Start Timer 🏁"):
-        st.write(f"Starting a {minutes}-minute mindfulness session. Relax and breathe deeply. 🧘‍♂️")
-
-        with st.empty():
-            for remaining in range(seconds, 0, -1):
-                mins, secs = divmod(remaining, 60)
-                st.write(f"⏳ Time left: {mins:02}:{secs:02}")
-                time.sleep(1)
 
+    finish_timer_if_due()
+    if "timer_deadline" in st.session_state:
+        # The browser counts down; the server only looks at the deadline every TIMER_CHECK_INTERVAL
+        st.write(f"Starting a {st.session_state['timer_minutes']}-minute mindfulness session. "
+                 f"Relax and breathe deeply. 🧘‍♂️")
+        remaining = st.session_state["timer_deadline"] - time.monotonic()
+        st.iframe(countdown_html(remaining, "#FFFFFF" if st.session_state["theme"] == "Dark" else "#2E7D32"), height=40)
+        st.button("Stop Timer ⏹️", on_click=stop_timer)
+        watch_timer()
+    else:
+        st.button("Start Timer 🏁", on_click=start_timer, args=(minutes,))
+        if st.session_state.pop("timer_completed", None):
             st.success("✅ Session Complete! Take a moment to reflect in the Gratitude Journal. 💙")
             show_confetti()  # 🎉 Trigger Confetti Effect
 
-# 📚 Mindfulness Course Tab
+    show_meditation_stats()
+
+# 🌬️ Guided Breathing Tab
 with tab2:
+    st.title("🌬️ Guided Breathing")
+
+    finish_breathing_if_due()
+    if "breathing_started" in st.session_state:
+        # Animated in the browser; the server only checks for the end every TIMER_CHECK_INTERVAL
+        st.write(f"{st.session_state['breathing_program']}: follow the circle. 🧘‍♀️")
+        elapsed = time.monotonic() - st.session_state["breathing_started"]
+        st.iframe(breathing_html(st.session_state["breathing_phases"], elapsed,
+                                 "#FFFFFF" if st.session_state["theme"] == "Dark" else "#2E7D32",
+                                 st.session_state["primary_color"]), height=240)
+        st.button("Stop Breathing ⏹️", on_click=stop_breathing)
+        watch_breathing()
+    else:
+        program_name = st.selectbox("Choose a technique", list(breathing.PROGRAMS))
+        program = breathing.PROGRAMS[program_name]
+        cycles = st.slider("Number of breaths", 1, 60, program["cycles"])
+        st.caption(" → ".join(f"{name} {seconds}s" for name, _, seconds in program["phases"]) +
+                   f", about {breathing.duration(breathing.timeline(program, cycles)) / 60:.1f} minutes")
+        st.button("Start Breathing 🌬️", on_click=start_breathing, args=(program_name, cycles))
+        completed = st.session_state.pop("breathing_completed", None)
+        if completed:
+            st.success(f"✅ {completed} complete! Take a moment to notice how you feel. 💙")
+
+# 📚 Mindfulness Course Tab
+with tab3:
     st.title("📚 Mindfulness Course")
 
     # List of course topics with expanded content
@@ -313,9 +490,10 @@ with tab2:
         }
     ]
 
-    # Ensure session state variable exists
-    if "course_progress" not in st.session_state:
-        st.session_state["course_progress"] = 0
+    # Load the saved progress when the session starts or a different user logs in
+    if "course_progress" not in st.session_state or st.session_state.get("course_progress_user") != user_id:
+        st.session_state["course_progress"] = meditation_log.stats(user_id)["course_progress"] if user_id else 0
+        st.session_state["course_progress_user"] = user_id
 
     # Get the current section (Index)
     current_step = int(st.session_state["course_progress"] * len(course_content))
@@ -346,17 +524,20 @@ with tab2:
                     st.session_state["course_progress"] = max(
                         0, st.session_state["course_progress"] - 1 / (len(course_content) - 1)
                     )
+                    save_course_progress()
                 st.rerun()
 
         with col2:
             if st.button("Complete this section ✅"):
                 if st.session_state["course_progress"] < 1.0:
                     st.session_state["course_progress"] += 1/ (len(course_content))  # Moves in 5 steps
+                    save_course_progress()
                 st.rerun()
 
         with col3:
             if st.button("🔄 Reset Course"):
                 st.session_state["course_progress"] = 0
+                save_course_progress()
                 st.rerun()
 
     else:
@@ -367,7 +548,6 @@ with tab2:
         # Reset Course Button after completion
         if st.button("🔄 Reset Course"):
             st.session_state["course_progress"] = 0
+            save_course_progress()
             st.rerun()
 
-webview.create_window("Streamlit App", "http://localhost:8501")
-webview.start()
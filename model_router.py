@@ -0,0 +1,91 @@
+import os
+import json
+
+from ai_metrics import METRICS_LOG_FILE
+from ollama_client import DEFAULT_MODEL
+
+MODEL_ROUTES_FILE = "model_routes.json"
+SMALL_MODEL = os.environ.get("OLLAMA_SMALL_MODEL")  # e.g. "phi3:mini"; only routed to when it is set
+
+# Tried in order; the first route whose limits the request fits is used. The last
+# route has no limits and catches everything else. Override with model_routes.json.
+DEFAULT_ROUTES = [
+    {"name": "quick", "model": SMALL_MODEL, "max_prompt_chars": 200, "max_depth": 6},
+    {"name": "full", "model": DEFAULT_MODEL},
+] if SMALL_MODEL else [
+    {"name": "full", "model": DEFAULT_MODEL},
+]
+
+
+def load_routes():
+    if os.path.exists(MODEL_ROUTES_FILE):
+        with open(MODEL_ROUTES_FILE, "r") as f:
+            return json.load(f)
+    return DEFAULT_ROUTES
+
+
+def model_names(routes=None):
+    names = []
+    for route in routes or load_routes():
+        if route["model"] not in names:
+            names.append(route["model"])
+    return names
+
+
+def route(prompt, depth, choice=None, routes=None):
+    """Pick a model for a request.
+
+    ``depth`` is the number of earlier turns in the conversation and ``choice`` an
+    explicit model name picked by the user, which always wins. Returns a dict with
+    the route name, the model and the reason it was chosen.
+    """
+    routes = routes or load_routes()
+    if choice:
+        return {"route": "user choice", "model": choice, "reason": "chosen by the user"}
+    for candidate in routes:
+        if len(prompt) > candidate.get("max_prompt_chars", float("inf")):
+            continue
+        if depth > candidate.get("max_depth", float("inf")):
+            continue
+        limits = [f"{key}={candidate[key]}" for key in ("max_prompt_chars", "max_depth") if key in candidate]
+        reason = f"within {', '.join(limits)}" if limits else "fallback"
+        return {"route": candidate["name"], "model": candidate["model"], "reason": reason}
+    return {"route": "default", "model": DEFAULT_MODEL, "reason": "no route matched"}
+
+
+def summarize(log_file=METRICS_LOG_FILE):
+    """Return request count, mean latency and mean tokens/second for each route and model.
+
+    Routing decisions are logged with each request's timings by ``ai_metrics.record``.
+    """
+    totals = {}
+    if not os.path.exists(log_file):
+        return totals
+    with open(log_file, "r") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "route" not in entry:
+                continue  # Not sent through the router
+            stats = totals.setdefault((entry["route"], entry["model"]), {"requests": 0, "latency": 0.0, "tps": []})
+            stats["requests"] += 1
+            stats["latency"] += entry["latency"] or 0.0
+            if entry.get("tokens_per_second"):
+                stats["tps"].append(entry["tokens_per_second"])
+    return {
+        key: {
+            "requests": stats["requests"],
+            "mean_latency": stats["latency"] / stats["requests"],
+            "mean_tokens_per_second": sum(stats["tps"]) / len(stats["tps"]) if stats["tps"] else None,
+        }
+        for key, stats in totals.items()
+    }
+
+
+if __name__ == "__main__":
+    print(f"{'route':<14} {'model':<20} {'requests':>8} {'latency':>9} {'tokens/s':>9}")
+    for (route_name, model), stats in sorted(summarize().items()):
+        tps = f"{stats['mean_tokens_per_second']:.1f}" if stats["mean_tokens_per_second"] else "-"
+        print(f"{route_name:<14} {model:<20} {stats['requests']:>8} {stats['mean_latency']:>8.2f}s {tps:>9}")
@@ -0,0 +1,84 @@
+import os
+import time
+import threading
+from datetime import datetime
+
+from ollama_client import (DEFAULT_MODEL, EMBED_PATH, KEEP_ALIVE, endpoints, measure_ttft, warm_up,
+                           warm_up_embeddings)
+
+ACTIVE_HOURS = os.environ.get("OLLAMA_ACTIVE_HOURS", "7-23")  # Local hours the model is kept loaded, "start-end"
+HEARTBEAT_INTERVAL = float(os.environ.get("OLLAMA_HEARTBEAT_INTERVAL", "240"))  # Keep below OLLAMA_KEEP_ALIVE
+
+statuses = {}  # Model name -> warm-up status, see start()
+
+_started_lock = threading.Lock()
+
+
+def in_active_hours(now=None, active_hours=ACTIVE_HOURS):
+    start, end = (int(hour) for hour in active_hours.split("-"))
+    hour = (now or datetime.now()).hour
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end  # A range that wraps past midnight, e.g. "20-2"
+
+
+def start(model=DEFAULT_MODEL, embedding=False):
+    """Pre-load ``model`` and keep it loaded during active hours. Safe to call on every rerun.
+
+    With ``embedding`` the model is loaded through the embedding API, which is the
+    only one embedding models answer.
+    """
+    with _started_lock:
+        if model in statuses:
+            return
+        statuses[model] = {
+            "embedding": embedding,
+            "keep_alive": KEEP_ALIVE,
+            # Time to first token, or for an embedding model to the embedding, while loading and once loaded
+            "cold_ttft": None,
+            "warm_ttft": None,
+            "last_heartbeat": None,
+            "error": None,
+        }
+    threading.Thread(target=_run, args=(model,), name=f"ollama-warmup-{model}", daemon=True).start()
+
+
+def _run(model):
+    # Every server in the pool may be asked for the model, so each one is kept warm.
+    # The reported TTFTs are the slowest server's.
+    status = statuses[model]
+
+    def measure(endpoint):
+        if status["embedding"]:
+            return warm_up_embeddings(model, endpoint.base_url + EMBED_PATH)
+        return measure_ttft(model, endpoint.generate_url)
+
+    for endpoint in endpoints:
+        try:
+            # The first request pays for loading the model; the second shows the warm latency
+            cold_ttft = measure(endpoint)
+            warm_ttft = measure(endpoint)
+            status["cold_ttft"] = max(cold_ttft, status["cold_ttft"] or 0)
+            status["warm_ttft"] = max(warm_ttft, status["warm_ttft"] or 0)
+            status["last_heartbeat"] = time.time()
+            print(f"Warmed up {model} on {endpoint.base_url}: {cold_ttft:.2f}s cold, "
+                  f"{warm_ttft:.2f}s warm")
+        except Exception as e:
+            status["error"] = str(e)
+            print(f"Failed to warm up {model} on {endpoint.base_url}: {e}")
+
+    while True:
+        time.sleep(HEARTBEAT_INTERVAL)
+        if not in_active_hours():
+            continue  # Let the keep-alive lapse overnight so the model's memory is freed
+        errors = []
+        for endpoint in endpoints:
+            try:
+                if status["embedding"]:
+                    warm_up_embeddings(model, endpoint.base_url + EMBED_PATH)
+                else:
+                    warm_up(model, endpoint.generate_url)
+                status["last_heartbeat"] = time.time()
+            except Exception as e:
+                errors.append(f"{endpoint.base_url}: {e}")
+        status["error"] = "; ".join(errors) or None
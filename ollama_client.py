@@ -0,0 +1,329 @@
+import os
+import json
+import time
+import asyncio
+import threading
+import weakref
+from contextlib import contextmanager
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:  # Only needed for the asyncio client
+    httpx = None
+
+GENERATE_PATH = "/api/generate"
+EMBED_PATH = "/api/embed"
+HEALTH_PATH = "/api/tags"
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/api/generate")
+# Several model servers as comma-separated base URLs, e.g. "http://gpu1:11434,http://gpu2:11434"
+OLLAMA_URLS = [url.strip().rstrip("/") for url in os.environ.get("OLLAMA_URLS", "").split(",") if url.strip()]
+HEALTH_CHECK_INTERVAL = float(os.environ.get("OLLAMA_HEALTH_CHECK_INTERVAL", "10"))
+DEFAULT_MODEL = os.environ.get("OLLAMA_MODEL", "mistral")
+EMBED_MODEL = os.environ.get("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")  # How long the server keeps a model loaded after a request
+CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.environ.get("OLLAMA_READ_TIMEOUT", "120"))  # Longest wait for the next streamed chunk
+MAX_CONCURRENT_REQUESTS = int(os.environ.get("OLLAMA_MAX_CONCURRENT_REQUESTS", "4"))  # Per model server
+POOL_SIZE = int(os.environ.get("OLLAMA_POOL_SIZE", str(MAX_CONCURRENT_REQUESTS)))  # Connections kept per server
+
+
+class Endpoint:
+    """One model server in the pool, with the load and health the client has seen."""
+
+    def __init__(self, base_url, generate_url=None):
+        self.base_url = base_url
+        self.generate_url = generate_url or base_url + GENERATE_PATH
+        self.healthy = True  # Until a health check or a request says otherwise
+        self.slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+        self.in_flight = 0  # Requests sent here, running or waiting for a slot
+        self.served = 0
+        self.last_error = None
+        self.last_checked = None
+
+    def mark_down(self, error):
+        with _pool_lock:
+            self.healthy = False
+            self.last_error = str(error)
+
+
+endpoints = [Endpoint(url) for url in OLLAMA_URLS] or [
+    Endpoint(OLLAMA_URL.removesuffix(GENERATE_PATH), OLLAMA_URL)]
+
+_session = None
+_session_lock = threading.Lock()
+_pool_lock = threading.Lock()
+_health_checker = None
+_other_endpoints = {}  # Explicit URLs outside the pool, so their requests share slots too
+
+# httpx clients and semaphores belong to one event loop, so each loop gets its own
+_async_state = weakref.WeakKeyDictionary()
+
+
+def get_session():
+    """Return the process-wide pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=len(endpoints), pool_maxsize=POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def _candidates(url=None):
+    """Return the endpoints to try for one request, in order.
+
+    An explicit ``url`` is used on its own, as the pooled endpoint it belongs to if
+    there is one. Otherwise healthy endpoints come first, least loaded first,
+    followed by the ones marked down as a last resort, since their health may have
+    changed since the last check.
+    """
+    if url is not None:
+        base_url = url.removesuffix(GENERATE_PATH).removesuffix(EMBED_PATH)
+        with _pool_lock:
+            for endpoint in endpoints:
+                if endpoint.base_url == base_url:
+                    return [endpoint]
+            if base_url not in _other_endpoints:
+                _other_endpoints[base_url] = Endpoint(base_url)
+            return [_other_endpoints[base_url]]
+    _start_health_checks()
+    with _pool_lock:
+        return sorted(endpoints, key=lambda endpoint: (not endpoint.healthy, endpoint.in_flight, endpoint.served))
+
+
+@contextmanager
+def _counted(endpoint):
+    with _pool_lock:
+        endpoint.in_flight += 1  # Counted while waiting for a slot too, so the next request picks a less busy server
+        endpoint.served += 1
+    try:
+        yield endpoint
+    finally:
+        with _pool_lock:
+            endpoint.in_flight -= 1
+
+
+@contextmanager
+def _in_flight(endpoint):
+    """Hold one of ``endpoint``'s request slots, waiting for one if they are all taken."""
+    with _counted(endpoint), endpoint.slots:
+        yield endpoint
+
+
+def _start_health_checks():
+    global _health_checker
+    if len(endpoints) < 2 or _health_checker is not None:
+        return  # With a single server there is nothing to fail over to
+    with _pool_lock:
+        if _health_checker is None:
+            _health_checker = threading.Thread(target=_check_health, name="ollama-health", daemon=True)
+            _health_checker.start()
+
+
+def _check_health():
+    while True:
+        for endpoint in endpoints:
+            try:
+                get_session().get(endpoint.base_url + HEALTH_PATH,
+                                  timeout=(CONNECT_TIMEOUT, CONNECT_TIMEOUT)).raise_for_status()
+                with _pool_lock:
+                    endpoint.healthy = True
+                    endpoint.last_error = None
+            except requests.exceptions.RequestException as e:
+                endpoint.mark_down(e)
+            endpoint.last_checked = time.time()
+        time.sleep(HEALTH_CHECK_INTERVAL)
+
+
+def endpoint_status():
+    """Return a snapshot of every pooled endpoint's health and load."""
+    with _pool_lock:
+        return [{"url": endpoint.base_url, "healthy": endpoint.healthy, "in_flight": endpoint.in_flight,
+                 "served": endpoint.served, "last_error": endpoint.last_error} for endpoint in endpoints]
+
+
+def _failed_server(error):
+    """Return True if ``error`` means the server is down or broken, rather than that the request was bad."""
+    response = getattr(error, "response", None)
+    return response is None or response.status_code >= 500
+
+
+def _request_body(payload, stream):
+    return {"keep_alive": KEEP_ALIVE, **payload, "stream": stream}
+
+
+def _iter_chunks(lines):
+    for line in lines:
+        if line:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Skip invalid JSON chunks
+
+
+def stream_generate(payload, url=None):
+    """Stream a generation, yielding each parsed JSON chunk.
+
+    The request goes to ``url``, or else to the least loaded healthy endpoint. If
+    a server can't be reached, the next one is tried; once chunks have been
+    yielded the error is raised instead, since starting over elsewhere would
+    repeat them. A 5xx answer counts as a failed server too. At most MAX_CONCURRENT_REQUESTS requests run at once on each
+    endpoint; further requests sent there wait for a slot. Closing the generator closes the HTTP
+    response, which stops the generation on the model server. Raises
+    ``requests.exceptions.RequestException`` on connection errors, timeouts and
+    error statuses.
+    """
+    error = None
+    for endpoint in _candidates(url):
+        received = False
+        try:
+            with _in_flight(endpoint), get_session().post(
+                    endpoint.generate_url, json=_request_body(payload, True), stream=True,
+                    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+                response.raise_for_status()
+                for chunk in _iter_chunks(response.iter_lines()):
+                    received = True
+                    yield chunk
+            return
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.HTTPError) as e:
+            if not _failed_server(e):
+                raise
+            endpoint.mark_down(e)
+            if received:
+                raise
+            error = e
+    raise error
+
+
+def _post(body, path, url=None):
+    # One non-streaming request, with endpoints picked and skipped as in stream_generate
+    error = None
+    for endpoint in _candidates(url):
+        try:
+            with _in_flight(endpoint):
+                response = get_session().post(url or endpoint.base_url + path, json=body,
+                                              timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+            response.raise_for_status()
+            return response.json()
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.HTTPError) as e:
+            if not _failed_server(e):
+                raise
+            endpoint.mark_down(e)
+            error = e
+    raise error
+
+
+def generate(payload, url=None):
+    """Run a generation to completion and return Ollama's final JSON object.
+
+    Endpoints are picked, and unreachable ones skipped, as in ``stream_generate``.
+    """
+    return _post(_request_body(payload, False), GENERATE_PATH, url)
+
+
+def embed(texts, model=EMBED_MODEL, url=None):
+    """Return one embedding vector (a list of floats) for each of ``texts``."""
+    return _post({"model": model, "input": list(texts), "keep_alive": KEEP_ALIVE}, EMBED_PATH, url)["embeddings"]
+
+
+def warm_up(model=DEFAULT_MODEL, url=None):
+    """Load ``model`` into memory with an empty generation and return the seconds it took."""
+    started = time.perf_counter()
+    generate({"model": model, "prompt": ""}, url)
+    return time.perf_counter() - started
+
+
+def warm_up_embeddings(model=EMBED_MODEL, url=None):
+    """Load the embedding ``model`` into memory with a one-word embedding and return the seconds it took."""
+    started = time.perf_counter()
+    embed(["warm"], model, url)
+    return time.perf_counter() - started
+
+
+def measure_ttft(model=DEFAULT_MODEL, url=None):
+    """Return the seconds until the first token of a one-token generation arrives."""
+    started = time.perf_counter()
+    for chunk in stream_generate({"model": model, "prompt": "Hi", "options": {"num_predict": 1}}, url):
+        if chunk.get("response") or chunk.get("done"):
+            return time.perf_counter() - started
+    return time.perf_counter() - started
+
+
+def _get_async_state():
+    loop = asyncio.get_running_loop()
+    state = _async_state.get(loop)
+    if state is None:
+        if httpx is None:
+            raise RuntimeError("The asyncio Ollama client needs the httpx package (pip install httpx)")
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+        )
+        state = _async_state[loop] = (client, {})  # Base URL -> that endpoint's semaphore in this loop
+    return state
+
+
+def _async_slots(slots, endpoint):
+    if endpoint.base_url not in slots:
+        slots[endpoint.base_url] = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    return slots[endpoint.base_url]
+
+
+async def astream_generate(payload, url=None):
+    """asyncio version of ``stream_generate``. Raises ``httpx.HTTPError`` on failures."""
+    client, slots = _get_async_state()
+    error = None
+    for endpoint in _candidates(url):
+        received = False
+        try:
+            with _counted(endpoint):
+                async with _async_slots(slots, endpoint), client.stream(
+                        "POST", endpoint.generate_url, json=_request_body(payload, True)) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        for chunk in _iter_chunks([line]):
+                            received = True
+                            yield chunk
+            return
+        except (httpx.NetworkError, httpx.RemoteProtocolError, httpx.HTTPStatusError) as e:
+            if not _failed_server(e):
+                raise
+            endpoint.mark_down(e)
+            if received:
+                raise
+            error = e
+    raise error
+
+
+async def agenerate(payload, url=None):
+    """asyncio version of ``generate``."""
+    client, slots = _get_async_state()
+    error = None
+    for endpoint in _candidates(url):
+        try:
+            with _counted(endpoint):
+                async with _async_slots(slots, endpoint):
+                    response = await client.post(endpoint.generate_url, json=_request_body(payload, False))
+            response.raise_for_status()
+            return response.json()
+        except (httpx.NetworkError, httpx.RemoteProtocolError, httpx.HTTPStatusError) as e:
+            if not _failed_server(e):
+                raise
+            endpoint.mark_down(e)
+            error = e
+    raise error
+
+
+async def aclose():
+    """Close the current event loop's httpx client."""
+    state = _async_state.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+        await state[0].aclose()
@@ -0,0 +1,203 @@
+import os
+import json
+import threading
+from hashlib import sha256
+from collections import deque
+
+from ollama_client import MAX_CONCURRENT_REQUESTS, endpoints, stream_generate
+
+# Generations sent to each model server at once; match it to the servers' OLLAMA_NUM_PARALLEL
+MAX_IN_FLIGHT = int(os.environ.get("OLLAMA_NUM_PARALLEL", str(MAX_CONCURRENT_REQUESTS))) * len(endpoints)
+MAX_QUEUE_DEPTH = int(os.environ.get("OLLAMA_MAX_QUEUE", "16"))  # Queued generations before new ones are rejected
+
+_lock = threading.Condition()
+_queues = {}  # user id -> deque of queued generations, in round-robin order
+_pending = {}  # payload key -> generation that is queued or running
+_running = set()  # Generations being streamed from the model right now
+_workers = []
+
+
+class SchedulerBusy(Exception):
+    """Raised by ``submit`` when the queue is full; the caller should try again later."""
+
+    def __init__(self, depth):
+        super().__init__(f"{depth} generations are already waiting")
+        self.depth = depth
+
+
+class Generation:
+    """One model generation, shared by every caller that asked for the same payload."""
+
+    def __init__(self, key, payload, user_id):
+        self.key = key
+        self.payload = payload
+        self.user_id = user_id  # Whose queue it waits in
+        self.chunks = []  # Everything streamed so far, so callers joining late can catch up
+        self.done = False
+        self.error = None
+        self.started = False
+        self.cancelled = False
+        self.waiters = 0  # Callers still following it; guarded by the scheduler lock
+        self.condition = threading.Condition()
+
+    def publish(self, chunk):
+        with self.condition:
+            self.chunks.append(chunk)
+            self.condition.notify_all()
+
+    def finish(self, error=None):
+        with self.condition:
+            self.error = error
+            self.done = True
+            self.condition.notify_all()
+
+
+def payload_key(payload):
+    return sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def submit(user_id, payload, poll_interval=None):
+    """Queue a generation for ``user_id`` and return an iterator over its streamed chunks.
+
+    Users are served round-robin, at most MAX_IN_FLIGHT generations run at a time,
+    and a payload identical to one already queued or running joins it instead of
+    starting a second generation. Errors from the client are re-raised to every caller.
+
+    Closing the iterator gives up on the generation; once nobody follows it any more
+    it is dropped from the queue, or its stream is closed if it is already running.
+    Raises ``SchedulerBusy`` instead of queueing when MAX_QUEUE_DEPTH generations are
+    already waiting. See ``follow`` for ``poll_interval``.
+    """
+    key = payload_key(payload)
+    with _lock:
+        generation = _pending.get(key)
+        if generation is None:
+            depth = sum(len(queue) for queue in _queues.values())
+            if depth >= MAX_QUEUE_DEPTH:
+                raise SchedulerBusy(depth)
+            generation = _pending[key] = Generation(key, payload, user_id)
+            _queues.setdefault(user_id, deque()).append(generation)
+            _lock.notify()
+        generation.waiters += 1
+        _start_workers()
+    return follow(generation, poll_interval)
+
+
+def follow(generation, poll_interval=None):
+    """Yield a generation's chunks as they arrive, starting from the first one.
+
+    With a ``poll_interval`` (seconds), a ``{"waiting": True, "ahead": n}`` chunk is
+    yielded whenever nothing arrived for that long, where ``n`` is the number of
+    generations that run before this one (0 once it has started). This lets callers
+    show progress, and notice that they were interrupted, while waiting in line.
+    """
+    index = 0
+    try:
+        while True:
+            with generation.condition:
+                if index >= len(generation.chunks) and not generation.done:
+                    generation.condition.wait(poll_interval)
+                chunks = generation.chunks[index:]
+                done = generation.done
+            if not chunks and not done:
+                if poll_interval is not None:
+                    yield {"waiting": True, "ahead": queue_position(generation)}
+                continue
+            yield from chunks
+            index += len(chunks)
+            if done and index >= len(generation.chunks):
+                if generation.error is not None:
+                    raise generation.error
+                return
+    finally:
+        _release(generation)
+
+
+def _release(generation):
+    with _lock:
+        generation.waiters -= 1
+        if generation.waiters > 0 or generation.done:
+            return
+        # Nobody is reading this generation any more, so stop spending model time on it
+        generation.cancelled = True
+        if _pending.get(generation.key) is generation:
+            del _pending[generation.key]
+        queue = _queues.get(generation.user_id)
+        if queue is not None and generation in queue:
+            queue.remove(generation)
+            if not queue:
+                del _queues[generation.user_id]
+
+
+def queue_position(generation):
+    """Return how many queued generations run before ``generation``, or 0 once it started."""
+    with _lock:
+        queue = _queues.get(generation.user_id)
+        if generation.started or queue is None or generation not in queue:
+            return 0
+        rounds = queue.index(generation)  # Full round-robin rounds before its turn comes
+        ahead = rounds
+        for user_id, other in _queues.items():
+            if user_id == generation.user_id:
+                break
+            ahead += min(len(other), rounds + 1)  # Users ahead of it in this round go first
+        for user_id, other in reversed(_queues.items()):
+            if user_id == generation.user_id:
+                break
+            ahead += min(len(other), rounds)
+        return ahead
+
+
+def queue_depth():
+    with _lock:
+        return sum(len(queue) for queue in _queues.values())
+
+
+def active():
+    """Return the number of generations queued or running; background work waits for 0."""
+    with _lock:
+        return sum(len(queue) for queue in _queues.values()) + len(_running)
+
+
+def _start_workers():
+    # Called with _lock held
+    while len(_workers) < MAX_IN_FLIGHT:
+        worker = threading.Thread(target=_work, name=f"ollama-worker-{len(_workers)}", daemon=True)
+        _workers.append(worker)
+        worker.start()
+
+
+def _next_generation():
+    with _lock:
+        while not _queues:
+            _lock.wait()
+        # Take the first user's oldest generation, then move that user to the back
+        user_id = next(iter(_queues))
+        queue = _queues.pop(user_id)
+        generation = queue.popleft()
+        if queue:
+            _queues[user_id] = queue
+        generation.started = True
+        _running.add(generation)
+        return generation
+
+
+def _work():
+    while True:
+        generation = _next_generation()
+        error = None
+        stream = stream_generate(generation.payload)
+        try:
+            for chunk in stream:
+                if generation.cancelled:
+                    break  # Checked per chunk, so a cancelled generation stops at its next token
+                generation.publish(chunk)
+        except Exception as e:
+            error = e
+        finally:
+            stream.close()  # Closes the HTTP response, which stops the generation on the server
+            with _lock:
+                if _pending.get(generation.key) is generation:
+                    del _pending[generation.key]
+                _running.discard(generation)
+            generation.finish(error)
@@ -0,0 +1,204 @@
+import json
+import time
+import random
+import threading
+import math
+from hashlib import sha256
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+EMBEDDING_DIM = 64
+WORDS = ("breathe gently notice the present moment with kindness and let each thought pass like a cloud "
+         "gratitude grows when we pause to appreciate small things a warm cup of tea a friend's smile "
+         "the quiet of the morning").split()
+
+
+class StandinSettings:
+    """How the stand-in behaves; shared by every request a server handles."""
+
+    def __init__(self, tokens_per_second=30.0, latency=0.2, load_time=0.0, error_rate=0.0, drop_rate=0.0,
+                 max_tokens=120, seed=None):
+        self.tokens_per_second = tokens_per_second
+        self.latency = latency  # Seconds before the first token (prompt evaluation)
+        self.load_time = load_time  # Extra seconds the first request for each model waits
+        self.error_rate = error_rate  # Fraction of requests answered with HTTP 500
+        self.drop_rate = drop_rate  # Fraction of streams cut off halfway
+        self.max_tokens = max_tokens  # Used when the request has no options.num_predict
+        self.random = random.Random(seed)
+        self.loaded_models = set()
+        self.stats = {"requests": 0, "errors": 0, "dropped": 0, "cancelled": 0, "tokens": 0}
+        self.lock = threading.Lock()
+
+    def roll(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+    def count(self, stat, amount=1):
+        with self.lock:
+            self.stats[stat] += amount
+
+
+def answer_words(prompt, count):
+    """Deterministic filler text for ``prompt``, so repeated prompts get repeated answers."""
+    seed = int(sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+    return [WORDS[(seed + i * 7) % len(WORDS)] for i in range(count)]
+
+
+def embedding(text):
+    """A normalized bag-of-words vector, so texts sharing words come out similar."""
+    vector = [0.0] * EMBEDDING_DIM
+    for word in text.lower().split():
+        digest = sha256(word.strip(".,!?;:'\"").encode("utf-8")).digest()
+        vector[digest[0] % EMBEDDING_DIM] += 1.0 if digest[1] % 2 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """Speaks the parts of Ollama's HTTP API the app uses: /api/generate, /api/embed and /api/tags."""
+
+    protocol_version = "HTTP/1.1"
+    settings = StandinSettings()
+
+    def log_message(self, format, *args):
+        pass  # One line per token would drown everything else
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != "/api/tags":
+            self.send_json(404, {"error": "not found"})
+            return
+        models = sorted(self.settings.loaded_models)
+        self.send_json(200, {"models": [{"name": model, "model": model} for model in models]})
+
+    def do_POST(self):
+        if self.path not in ("/api/generate", "/api/embed"):
+            self.send_json(404, {"error": "not found"})
+            return
+        settings = self.settings
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        settings.count("requests")
+        if settings.roll(settings.error_rate):
+            settings.count("errors")
+            self.send_json(500, {"error": "injected failure"})
+            return
+        if self.path == "/api/embed":
+            texts = body.get("input", [])
+            texts = [texts] if isinstance(texts, str) else texts
+            self.send_json(200, {"model": body.get("model"), "embeddings": [embedding(text) for text in texts]})
+            return
+
+        model = body.get("model", "standin")
+        prompt = body.get("prompt", "")
+        started = time.perf_counter()
+        load_duration = 0.0
+        if model not in settings.loaded_models:
+            time.sleep(settings.load_time)
+            load_duration = settings.load_time
+            with settings.lock:
+                settings.loaded_models.add(model)
+        count = (body.get("options") or {}).get("num_predict", settings.max_tokens)
+        words = answer_words(prompt, count) if prompt else []  # An empty prompt only loads the model
+        time.sleep(settings.latency)
+        prompt_eval_duration = settings.latency
+
+        if not body.get("stream", True):
+            time.sleep(len(words) / settings.tokens_per_second)
+            settings.count("tokens", len(words))
+            self.send_json(200, {
+                "model": model, "response": " ".join(words), "done": True,
+                **self.timings(started, load_duration, prompt, prompt_eval_duration, len(words)),
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        drop_at = len(words) // 2 if settings.roll(settings.drop_rate) else None
+        eval_started = time.perf_counter()
+        try:
+            for index, word in enumerate(words):
+                if index == drop_at:
+                    settings.count("dropped")
+                    self.close_connection = True
+                    return  # End without the terminating chunk, like a server dying mid-stream
+                # Sleep until this token's absolute due time, so the rate doesn't drift
+                time.sleep(max(0.0, eval_started + (index + 1) / settings.tokens_per_second - time.perf_counter()))
+                self.write_chunk({"model": model, "response": word + " ", "done": False})
+                settings.count("tokens")
+            self.write_chunk({
+                "model": model, "response": "", "done": True,
+                **self.timings(started, load_duration, prompt, prompt_eval_duration, len(words)),
+            })
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            settings.count("cancelled")  # The client closed the stream
+            self.close_connection = True
+
+    def write_chunk(self, body):
+        data = (json.dumps(body) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def timings(self, started, load_duration, prompt, prompt_eval_duration, eval_count):
+        # Durations in nanoseconds, as Ollama reports them
+        total = time.perf_counter() - started
+        return {
+            "total_duration": int(total * 1e9),
+            "load_duration": int(load_duration * 1e9),
+            "prompt_eval_count": len(prompt.split()),
+            "prompt_eval_duration": int(prompt_eval_duration * 1e9),
+            "eval_count": eval_count,
+            "eval_duration": int(max(0.0, total - load_duration - prompt_eval_duration) * 1e9),
+        }
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # Clients hanging up mid-stream is expected
+
+
+def serve(port=11434, host="127.0.0.1", settings=None, background=False):
+    """Start a stand-in server; with ``background`` it runs on a daemon thread and is returned.
+
+    Use port 0 to pick a free port; the chosen one is ``server.server_address[1]``.
+    """
+    handler = type("Handler", (StandinHandler,), {"settings": settings or StandinSettings()})
+    server = StandinServer((host, port), handler)
+    if background:
+        threading.Thread(target=server.serve_forever, name=f"ollama-standin-{port}", daemon=True).start()
+        return server
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fake Ollama server for tests and benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--tokens-per-second", type=float, default=30.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--load-time", type=float, default=0.0, help="Extra seconds for each model's first request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with HTTP 500")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Fraction of streams cut off halfway")
+    parser.add_argument("--max-tokens", type=int, default=120)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    print(f"Ollama stand-in listening on http://{args.host}:{args.port}")
+    try:
+        serve(args.port, args.host, StandinSettings(
+            args.tokens_per_second, args.latency, args.load_time, args.error_rate, args.drop_rate,
+            args.max_tokens, args.seed))
+    except KeyboardInterrupt:
+        pass
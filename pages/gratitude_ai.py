@@ -2,10 +2,25 @@ import streamlit as st
 import requests
 import json
 import os
+import time
+from contextlib import closing
 from textblob import TextBlob
-
-OLLAMA_URL = "http://localhost:11434/api/generate"
-CHAT_HISTORY_FILE = "chat_history.json"
+import ollama_client
+import ollama_scheduler
+import model_warmup
+import model_router
+import ai_metrics
+import response_cache
+import chat_log
+import journal_index
+import reflection_prompts
+from entry_store import JOURNAL_ROOT
+from chat_context import SYSTEM_PROMPT, SYSTEM_PROMPT_VERSION, build_context, clear_summary
+
+CHAT_WINDOW_TURNS = 10  # Turns rendered at first, and added by each "Load earlier turns"
+RENDER_INTERVAL = 0.05  # Seconds between UI updates while a response streams
+RENDER_MAX_CHARS = 500  # Render early once this many new characters are waiting
+QUEUE_POLL_INTERVAL = 0.5  # Seconds between queue position updates while waiting for the model
 
 def save_preferences():
     """Save theme preferences to a file."""
@@ -24,69 +39,129 @@ def analyze_sentiment(response):
     sentiment = TextBlob(response).sentiment.polarity
     return "positive" if sentiment > 0 else "neutral" if sentiment == 0 else "negative"
 
-def save_chat_history():
-    """Save chat history to a JSON file."""
-    with open(CHAT_HISTORY_FILE, "w") as file:
-        json.dump(st.session_state["chat_history"], file, indent=4)
+def save_chat_turn(turn):
+    """Append a chat turn to the current user's history log."""
+    chat_log.append_turn(st.session_state["user_id"], turn)
 
 # Function to load chat history
 def load_chat_history():
-    if os.path.exists(CHAT_HISTORY_FILE):
-        with open(CHAT_HISTORY_FILE, "r") as file:
-            try:
-                return json.load(file)
-            except json.JSONDecodeError:
-                return []  # If file is corrupted, return an empty list
-    return []  # If file doesn't exist, return empty history
-
-def ollama_request(prompt):
+    """Load the current user's most recent turns."""
+    turns = chat_log.read_tail(st.session_state["user_id"], CHAT_WINDOW_TURNS)
+    st.session_state["chat_window"] = CHAT_WINDOW_TURNS
+    st.session_state["chat_history_complete"] = len(turns) < CHAT_WINDOW_TURNS
+    return turns
+
+def load_earlier_turns():
+    """Widen the rendered window, reading older turns from the log when needed."""
+    history = st.session_state["chat_history"]
+    window = st.session_state["chat_window"] + CHAT_WINDOW_TURNS
+    missing = window - len(history)
+    if missing > 0:
+        older = chat_log.read_tail(st.session_state["user_id"], missing, skip=len(history))
+        st.session_state["chat_history"] = older + history
+        st.session_state["chat_history_complete"] = len(older) < missing
+    st.session_state["chat_window"] = window
+
+def submit_prompt():
+    """Queue the prompt once when it is entered, so later reruns don't ask it again."""
+    st.session_state["pending_prompt"] = st.session_state["ai_input"]
+
+def retry_prompt(prompt):
+    """Ask a prompt again that was turned away because the model was busy."""
+    st.session_state["pending_prompt"] = prompt
+
+def pick_suggestion(question):
+    """Ask one of today's suggested questions, answered ahead of time without conversation context."""
+    st.session_state["pending_prompt"] = question
+    st.session_state["pending_suggestion"] = True
+
+def ollama_request(prompt, use_cache=True, model_choice=None, use_journal=True, use_context=True):
     """Send a mindfulness-focused prompt to the model and stream the response properly."""
-    mindfulness_prompt = f"""
-        You are 'The Mind Partner' – a thoughtful AI designed to guide users 
-        through mindfulness, self-awareness, and mental well-being.
-
-        When responding, focus on:
-        - Encouraging mindfulness and self-reflection
-        - Providing practical meditation and relaxation techniques
-        - Offering perspective shifts to reduce stress and anxiety
-        - Promoting gratitude, positivity, and emotional balance
-
-        Be warm, empathetic, and inspiring.
-        If the user is anxious, gently guide them towards calmness.
-        If they are curious, provide insightful mindfulness teachings.
-
-        Here’s the user's question:
-        {prompt}
-    """
-
-    payload = {"model": "mistral", "prompt": mindfulness_prompt, "stream": True}
+    # Without context (a suggested question) the prompt is routed and sent as if the conversation just started
+    depth = len(st.session_state["chat_history"]) if use_context else 0
+    decision = model_router.route(prompt, depth, model_choice)
+    model = decision["model"]
+    # The cache only holds answers given without context, so they aren't personal, but any question
+    # that has one is answered from it, also in the middle of a conversation
+    key = response_cache.cache_key(prompt, model, SYSTEM_PROMPT_VERSION)
+    if not use_cache:
+        response_cache.record_bypass()
+    cached_response = response_cache.get(key) if use_cache else None
+    context = ""
+    if cached_response is None and use_context:
+        context = build_context(st.session_state["user_id"], model)
+        if use_journal:
+            journal = journal_index.retrieve(os.path.join(JOURNAL_ROOT, st.session_state["user_id"]), prompt)
+            context = "\n\n".join(part for part in (journal, context) if part)
+    payload = {"model": model, "prompt": SYSTEM_PROMPT.format(context=context, prompt=prompt)}
 
     try:
-        response = requests.post(OLLAMA_URL, json=payload, stream=True)
-        response.raise_for_status()
-
-        full_response = ""
+        parts = []  # Streamed tokens, joined only when the UI is updated
+        pending_chars = 0
+        started = last_render = time.monotonic()
+        first_token_at = None
+        final_chunk = None
         response_container = st.empty()  # Create an updating UI component
 
-        # Stream response properly
-        for line in response.iter_lines():
-            if line:
-                try:
-                    json_chunk = json.loads(line)  # Parse JSON chunk
-                    if "response" in json_chunk:
-                        full_response += json_chunk["response"]  # Append to final response
-                        st.session_state["current_response"] = full_response  # Store for persistence
-                        response_container.markdown(full_response)  # Update UI dynamically
-                except json.JSONDecodeError:
-                    continue  # Skip invalid JSON chunks
+        # Stream response through the shared scheduler, which is fair across users
+        if cached_response is not None:
+            chunks = response_cache.replay(cached_response)
+        else:
+            chunks = ollama_scheduler.submit(st.session_state["user_id"], payload, QUEUE_POLL_INTERVAL)
+        with closing(chunks):  # Closed right away when the script is stopped, not whenever it is collected
+            for json_chunk in chunks:
+                if json_chunk.get("waiting"):
+                    # Nothing new yet; rendering also lets Streamlit stop the script if the user moved on
+                    if parts:
+                        response_container.markdown("".join(parts))
+                    elif json_chunk["ahead"]:
+                        response_container.caption(f"Waiting for the model, {json_chunk['ahead']} requests ahead...")
+                    else:
+                        response_container.caption("Generating...")
+                    continue
+                if json_chunk.get("done"):
+                    final_chunk = json_chunk
+                if json_chunk.get("response"):
+                    if first_token_at is None:
+                        first_token_at = time.monotonic()
+                    parts.append(json_chunk["response"])
+                    pending_chars += len(json_chunk["response"])
+                    now = time.monotonic()
+                    # Coalesce tokens so the UI re-renders at most every RENDER_INTERVAL
+                    if now - last_render >= RENDER_INTERVAL or pending_chars >= RENDER_MAX_CHARS:
+                        parts = ["".join(parts)]
+                        st.session_state["current_response"] = parts[0]  # Store for persistence
+                        response_container.markdown(parts[0])
+                        pending_chars = 0
+                        last_render = now
+
+        full_response = "".join(parts)
+        st.session_state["current_response"] = full_response
+        response_container.markdown(full_response)
+
+        if cached_response is None:
+            ttft = first_token_at - started if first_token_at is not None else None
+            timings = ai_metrics.measure(final_chunk, ttft, time.monotonic() - started)
+            ai_metrics.record(model, timings, route=decision["route"], reason=decision["reason"],
+                              prompt_chars=len(prompt), depth=depth)
+        if use_cache and cached_response is None and full_response and not context:
+            response_cache.put(key, prompt, model, full_response)
 
         # Save full response in chat history
-        st.session_state["chat_history"].append({"user": prompt, "bot": full_response})
-        save_chat_history()
+        turn = {"user": prompt, "bot": full_response, "timestamp": time.time()}
+        st.session_state["chat_history"].append(turn)
+        save_chat_turn(turn)
 
         return full_response  # Return final response
 
+    except ollama_scheduler.SchedulerBusy:
+        st.warning("Gratitude AI is busy answering other questions right now. Please ask again in a minute.")
+        st.button("Ask again", on_click=retry_prompt, args=(prompt,), key="retry_prompt")
+        return None
+
     except requests.exceptions.RequestException as e:
+        ai_metrics.record(model, ai_metrics.measure(None, latency=time.monotonic() - started),
+                          route=decision["route"], reason=decision["reason"], error=str(e))
         return f"Error connecting to Ollama: {e}"
 
 def apply_theme(theme, primary_color):
@@ -175,8 +250,14 @@ def apply_theme(theme, primary_color):
     """, unsafe_allow_html=True)
 
 # Initialize session state variables
-if "chat_history" not in st.session_state:
+logged_in = st.session_state.get("logged_in", False) and st.session_state.get("user_id")
+
+# Reload when the session starts or a different user logs in
+if logged_in and st.session_state.get("chat_history_user") != st.session_state["user_id"]:
     st.session_state["chat_history"] = load_chat_history()
+    st.session_state["chat_history_user"] = st.session_state["user_id"]
+    # Catch up on entries saved or imported elsewhere, in the background
+    journal_index.schedule_sync(os.path.join(JOURNAL_ROOT, st.session_state["user_id"]))
 
 if "current_response" not in st.session_state:
     st.session_state["current_response"] = ""
@@ -189,6 +270,13 @@ if "primary_color" not in st.session_state:
 
 apply_theme(st.session_state["theme"], st.session_state["primary_color"])
 
+# Make sure the models are loaded (and kept loaded) before the first question arrives
+for routed_model in model_router.model_names():
+    model_warmup.start(routed_model)
+model_warmup.start(ollama_client.EMBED_MODEL, embedding=True)  # Journal retrieval embeds every question
+# Answer the day's suggested questions ahead of time, overnight
+reflection_prompts.start()
+
 # Sidebar for theme settings
 with st.sidebar:
     st.header("Customize Theme")
@@ -209,13 +297,44 @@ with st.sidebar:
     if st.button("Go to Mindfulness Timer 🕰️"):
         st.switch_page("pages/mindfulness_hub.py")
 
+    model_choice = st.selectbox("AI model:", ["Auto"] + model_router.model_names(), key="model_choice")
+
+    for routed_model, warmup in model_warmup.statuses.items():
+        if warmup["error"]:
+            st.caption(f"Model {routed_model}: not reachable ({warmup['error']})")
+        elif warmup["warm_ttft"] is not None and warmup["embedding"]:
+            st.caption(f"Embedding model {routed_model}: {warmup['cold_ttft']:.2f}s cold, "
+                       f"{warmup['warm_ttft']:.2f}s warm (keep-alive {warmup['keep_alive']})")
+        elif warmup["warm_ttft"] is not None:
+            st.caption(f"Model {routed_model}: first token in {warmup['cold_ttft']:.2f}s cold, "
+                       f"{warmup['warm_ttft']:.2f}s warm (keep-alive {warmup['keep_alive']})")
+        else:
+            st.caption(f"Model {routed_model}: loading...")
+
+    servers = ollama_client.endpoint_status()
+    if len(servers) > 1:
+        healthy = [server for server in servers if server["healthy"]]
+        st.caption(f"Model servers: {len(healthy)} of {len(servers)} healthy, "
+                   f"{sum(server['in_flight'] for server in servers)} requests in flight")
+
+    cache_stats = response_cache.stats()
+    st.caption(f"Answer cache: {cache_stats['entries']} answers, "
+               f"{cache_stats['hit_rate']:.0%} hit rate ({cache_stats['hits']} hits, {cache_stats['misses']} misses)")
+
 # Display AI Section
 st.title("🤖 Gratitude AI - Powered by Ollama")
 
+if not logged_in:
+    st.warning("Please log in on the Journal page before using Gratitude AI")
+    st.stop()
 
-# Display Chat History
+
+# Display Chat History, only the most recent window of turns
 st.subheader("Chat History")
-for chat in st.session_state["chat_history"]:
+visible_turns = st.session_state["chat_history"][-st.session_state["chat_window"]:]
+if len(visible_turns) < len(st.session_state["chat_history"]) or not st.session_state["chat_history_complete"]:
+    st.button("Load earlier turns", on_click=load_earlier_turns, key="load_earlier_turns")
+for chat in visible_turns:
     with st.chat_message("user"):
         st.write(chat["user"])
     if chat["bot"]:
@@ -223,7 +342,19 @@ for chat in st.session_state["chat_history"]:
             st.markdown(chat["bot"])
 
 # User Input
-user_prompt = st.text_input("Ask Gratitude AI anything...", placeholder="How can I feel more grateful today?", key="ai_input")
+st.text_input("Ask Gratitude AI anything...", placeholder="How can I feel more grateful today?", key="ai_input",
+              on_change=submit_prompt)
+skip_cache = st.checkbox("Ask for a fresh answer (skip the answer cache)", key="skip_cache")
+use_journal = st.checkbox("Let Gratitude AI read related journal entries", value=True, key="use_journal")
+
+suggested = reflection_prompts.suggestions()
+if suggested:
+    st.caption("Today's reflections:")
+    for column, question in zip(st.columns(len(suggested)), suggested):
+        column.button(question, on_click=pick_suggestion, args=(question,), key=f"suggestion_{question}")
+
+user_prompt = st.session_state.pop("pending_prompt", None)
+from_suggestion = st.session_state.pop("pending_suggestion", False)
 
 if user_prompt:
     with st.chat_message("user"):
@@ -231,13 +362,15 @@ if user_prompt:
 
     # Get AI response
     with st.spinner("Thinking... 🤔"):
-        ai_response = ollama_request(user_prompt)
+        ai_response = ollama_request(user_prompt, use_cache=not skip_cache,
+                                     model_choice=None if model_choice == "Auto" else model_choice,
+                                     use_journal=use_journal, use_context=not from_suggestion)
 
     # No need to append to chat history again (already done in `ollama_request()`)
 
 # Clear chat history button
 if st.button("Clear Chat History"):
     st.session_state["chat_history"] = []
-    if os.path.exists(CHAT_HISTORY_FILE):
-        os.remove(CHAT_HISTORY_FILE)
+    chat_log.clear_history(st.session_state["user_id"])
+    clear_summary(st.session_state["user_id"])
     st.rerun()
\ No newline at end of file
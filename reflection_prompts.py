@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import threading
+from datetime import date, datetime
+
+import response_cache
+import model_router
+import ollama_scheduler
+from chat_context import SYSTEM_PROMPT, SYSTEM_PROMPT_VERSION
+from model_warmup import in_active_hours
+from ollama_client import generate
+
+POOL_FILE = os.path.join(response_cache.CACHE_DIR, "reflections.json")
+IDLE_HOURS = os.environ.get("REFLECTION_HOURS", "1-5")  # Local hours the pool is filled, "start-end"
+NIGHTLY_BUDGET = float(os.environ.get("REFLECTION_NIGHTLY_SECONDS", "900"))  # Model time spent per night at most
+POOL_SIZE = 8  # Questions added each night
+QUESTION_REQUESTS = 3  # Requests per night for new questions, in case the model's answers are unusable
+MAX_AGE = 3 * 24 * 3600  # Seconds a question is suggested for; keep below response_cache.CACHE_TTL
+CHECK_INTERVAL = 120  # Seconds between steps of the background job
+SUGGESTIONS_SHOWN = 3
+
+# One theme per day, so the pool covers different ground over the week
+THEMES = ["gratitude", "stress and calm", "sleep and rest", "relationships", "self-compassion",
+          "focus at work or study", "starting the day mindfully"]
+
+QUESTIONS_PROMPT = """Write {count} short questions someone might ask a mindfulness and gratitude coach
+today, about {theme}. Make them varied and personal, each under 15 words. Write one question per line,
+without numbering or any other text."""
+
+_pool_lock = threading.Lock()  # Held while the pool file is read and written, never during a model call
+_start_lock = threading.Lock()
+_started = False
+
+
+def load_pool():
+    try:
+        with open(POOL_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {"night": None, "spent": 0.0, "question_requests": 0, "prompts": []}
+
+
+def save_pool(pool):
+    os.makedirs(os.path.dirname(POOL_FILE), exist_ok=True)
+    with open(f"{POOL_FILE}.tmp", "w") as f:
+        json.dump(pool, f)
+    os.replace(f"{POOL_FILE}.tmp", POOL_FILE)
+
+
+def suggestions(count=SUGGESTIONS_SHOWN, today=None):
+    """Return today's suggested questions, chosen from the answered, fresh part of the pool.
+
+    The choice rotates by day and is the same for every session on a given day.
+    """
+    now = time.time()
+    answered = [prompt["question"] for prompt in load_pool()["prompts"]
+                if prompt["answered"] and now - prompt["created"] <= MAX_AGE]
+    if not answered:
+        return []
+    offset = (today or date.today()).toordinal() * count % len(answered)
+    rotated = answered[offset:] + answered[:offset]
+    return rotated[:count]
+
+
+def _for_night(pool, night):
+    if pool["night"] == night:
+        return pool
+    # A new night: forget last night's spending and drop questions too old to suggest
+    return {"night": night, "spent": 0.0, "question_requests": 0,
+            "prompts": [prompt for prompt in pool["prompts"] if time.time() - prompt["created"] <= MAX_AGE]}
+
+
+def step(now=None):
+    """Do one unit of precomputation and return True if there was something to do.
+
+    A unit is either asking the model for tonight's questions or answering one of
+    them. Nothing is done once tonight's budget is spent. Answers are generated
+    exactly as the AI page would without conversation context, and stored in the
+    response cache, so picking a suggestion is served from the cache.
+    """
+    now = now or datetime.now()
+    night = now.date().isoformat()
+    with _pool_lock:
+        pool = _for_night(load_pool(), night)
+        if pool["spent"] >= NIGHTLY_BUDGET:
+            return False
+
+        unanswered = [prompt for prompt in pool["prompts"] if not prompt["answered"]]
+        tonight = [prompt for prompt in pool["prompts"] if prompt["night"] == night]
+        if not unanswered and (len(tonight) >= POOL_SIZE or pool["question_requests"] >= QUESTION_REQUESTS):
+            return False
+        question = unanswered[0]["question"] if unanswered else None
+        known = {prompt["question"] for prompt in pool["prompts"]}
+
+    # The lock is not held while the model works; the pool is read again to store the result
+    started = time.perf_counter()
+    answered, questions = False, []
+    try:
+        if question is None:
+            theme = THEMES[now.date().toordinal() % len(THEMES)]
+            questions = _questions(theme, POOL_SIZE - len(tonight), night, known)
+        else:
+            answered = _answer(question)
+    finally:
+        with _pool_lock:
+            pool = _for_night(load_pool(), night)
+            pool["spent"] += time.perf_counter() - started
+            if question is None:
+                pool["question_requests"] += 1
+                known = {prompt["question"] for prompt in pool["prompts"]}
+                pool["prompts"].extend(prompt for prompt in questions if prompt["question"] not in known)
+            elif answered:
+                for prompt in pool["prompts"]:
+                    if prompt["question"] == question:
+                        prompt["answered"] = True
+                        prompt["created"] = time.time()  # Fresh from now on, like the cached answer
+            save_pool(pool)
+    return True
+
+
+def _questions(theme, count, night, known):
+    model = model_router.route("", 0)["model"]
+    result = generate({"model": model, "prompt": QUESTIONS_PROMPT.format(count=count, theme=theme)})
+    questions = []
+    for line in result.get("response", "").splitlines():
+        question = line.strip().lstrip("-*0123456789.) ").strip()
+        if question.endswith("?") and question not in known and len(questions) < count:
+            questions.append({"question": question, "night": night, "created": time.time(), "answered": False})
+            known.add(question)
+    return questions
+
+
+def _answer(question):
+    """Answer ``question`` into the response cache; False if the model's answer was empty, to try again later."""
+    # Routed as a fresh conversation, the way the page routes a picked suggestion
+    model = model_router.route(question, 0)["model"]
+    result = generate({"model": model, "prompt": SYSTEM_PROMPT.format(context="", prompt=question)})
+    answer = result.get("response", "").strip()
+    if not answer:
+        return False
+    key = response_cache.cache_key(question, model, SYSTEM_PROMPT_VERSION)
+    response_cache.put(key, question, model, answer)
+    return True
+
+
+def start():
+    """Fill the pool in the background during idle hours. Safe to call on every rerun."""
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_run, name="reflection-prompts", daemon=True).start()
+
+
+def _run():
+    while True:
+        time.sleep(CHECK_INTERVAL)
+        if not in_active_hours(active_hours=IDLE_HOURS) or ollama_scheduler.active():
+            continue  # Only while nobody is waiting for the model
+        try:
+            while step() and not ollama_scheduler.active():
+                pass
+        except Exception as e:
+            print(f"Failed to precompute reflection prompts: {e}")
+
+
+if __name__ == "__main__":
+    # python reflection_prompts.py: fill tonight's pool now, within the nightly budget
+    while step():
+        pool = load_pool()
+        print(f"{sum(prompt['answered'] for prompt in pool['prompts'])}/{len(pool['prompts'])} answered, "
+              f"{pool['spent']:.0f}s of {NIGHTLY_BUDGET:.0f}s spent")
+    print("Suggestions:", *suggestions(), sep="\n- ")
@@ -0,0 +1,118 @@
+import os
+import re
+import json
+import time
+import threading
+from hashlib import sha256
+
+CACHE_DIR = os.environ.get("AI_CACHE_DIR", "ai_cache")
+CACHE_TTL = float(os.environ.get("AI_CACHE_TTL", str(7 * 24 * 3600)))  # Seconds a cached answer stays valid
+CACHE_MAX_ENTRIES = int(os.environ.get("AI_CACHE_MAX_ENTRIES", "500"))
+REPLAY_DELAY = 0.005  # Pause between replayed words, so cached answers still appear to stream
+
+_stats = {"hits": 0, "misses": 0, "bypassed": 0}
+_stats_lock = threading.Lock()
+
+
+def normalize_prompt(prompt):
+    """Fold case, whitespace and trailing punctuation so trivially different prompts share an answer."""
+    return re.sub(r"\s+", " ", prompt).strip().rstrip("?!. ").lower()
+
+
+def cache_key(prompt, model, system_prompt_version):
+    """Key an answer by its prompt alone; answers given with conversation or journal context don't belong here."""
+    raw = json.dumps([normalize_prompt(prompt), model, system_prompt_version])
+    return sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _path(key):
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+
+def _count(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def record_bypass():
+    _count("bypassed")
+
+
+def get(key):
+    """Return the cached answer for ``key``, or None if missing or older than CACHE_TTL."""
+    path = _path(key)
+    try:
+        with open(path, "r") as f:
+            record = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        _count("misses")
+        return None
+
+    if time.time() - record["created"] > CACHE_TTL:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        _count("misses")
+        return None
+
+    try:
+        os.utime(path)  # The modification time doubles as the LRU timestamp
+    except OSError:
+        pass
+    _count("hits")
+    return record["response"]
+
+
+def put(key, prompt, model, response, created=None):
+    """Store an answer, evicting the least recently used entries beyond CACHE_MAX_ENTRIES."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    record = {"prompt": prompt, "model": model, "response": response, "created": created or time.time()}
+    tmp_path = f"{_path(key)}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(record, f)
+    os.replace(tmp_path, _path(key))
+    evict()
+
+
+def evict(max_entries=CACHE_MAX_ENTRIES):
+    """Remove expired entries, then the least recently used ones until at most ``max_entries`` remain."""
+    if not os.path.isdir(CACHE_DIR):
+        return
+    now = time.time()
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            entries.append((os.path.getmtime(path), path))
+        except OSError:
+            continue
+    entries.sort()
+    expired = [path for mtime, path in entries if now - mtime > CACHE_TTL]
+    overflow = [path for _, path in entries[:max(len(entries) - max_entries, 0)]]
+    for path in set(expired + overflow):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def replay(response, delay=REPLAY_DELAY):
+    """Yield a cached answer as Ollama-style chunks, one word at a time."""
+    for word in re.findall(r"\S+\s*|\s+", response):
+        yield {"response": word, "done": False}
+        if delay:
+            time.sleep(delay)
+    yield {"response": "", "done": True, "cached": True}
+
+
+def stats():
+    """Return hit, miss and bypass counts for this process plus the hit rate."""
+    with _stats_lock:
+        result = dict(_stats)
+    lookups = result["hits"] + result["misses"]
+    result["hit_rate"] = result["hits"] / lookups if lookups else 0.0
+    result["entries"] = len([n for n in os.listdir(CACHE_DIR) if n.endswith(".json")]) if os.path.isdir(CACHE_DIR) else 0
+    return result
@@ -0,0 +1,32 @@
+from textblob import TextBlob
+
+from entry_store import content_hash
+
+SENTIMENT_CACHE_SIZE = 65536
+
+# Sentiment results keyed by content hash, shared with the blob store's addressing
+_sentiment_cache = {}
+
+
+def analyze_sentiment(entry):
+    blob = TextBlob(entry)
+    polarity = blob.sentiment.polarity
+    if polarity > 0:
+        return "Positive", polarity
+    elif polarity < 0:
+        return "Negative", polarity
+    else:
+        return "Neutral", polarity
+
+
+def analyze_sentiments(entries):
+    """Score a batch of texts, analysing each distinct text only once."""
+    results = []
+    for entry in entries:
+        digest = content_hash(entry)
+        if digest not in _sentiment_cache:
+            if len(_sentiment_cache) >= SENTIMENT_CACHE_SIZE:
+                _sentiment_cache.clear()
+            _sentiment_cache[digest] = analyze_sentiment(entry)
+        results.append(_sentiment_cache[digest])
+    return results
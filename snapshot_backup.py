@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import argparse
+from hashlib import sha256
+from datetime import datetime
+
+from entry_store import INDEX_DIR, JOURNAL_ROOT, compress, decompress
+
+BACKUP_ROOT = "backups"
+CHUNK_DIR = "chunks"
+SNAPSHOT_DIR = "snapshots"
+CHUNK_SIZE = 1 << 20  # Files are split into 1 MiB chunks, each stored once by hash
+SNAPSHOT_ID_FORMAT = "%Y%m%dT%H%M%S%f"
+
+
+def chunk_path(backup_root, digest):
+    return os.path.join(backup_root, CHUNK_DIR, digest[:2], digest)
+
+
+def store_chunk(backup_root, data):
+    """Store a chunk under its hash unless the repository already has it. Returns (digest, stored)."""
+    digest = sha256(data).hexdigest()
+    path = chunk_path(backup_root, digest)
+    if os.path.exists(path):
+        return digest, False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(compress(data))
+    os.replace(tmp_path, path)
+    return digest, True
+
+
+def list_snapshots(backup_root=BACKUP_ROOT):
+    """Return snapshot ids, oldest first."""
+    folder = os.path.join(backup_root, SNAPSHOT_DIR)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(name[:-len(".json")] for name in os.listdir(folder) if name.endswith(".json"))
+
+
+def load_manifest(backup_root, snapshot_id):
+    with open(os.path.join(backup_root, SNAPSHOT_DIR, f"{snapshot_id}.json"), "r") as f:
+        return json.load(f)
+
+
+def create_snapshot(source=JOURNAL_ROOT, backup_root=BACKUP_ROOT):
+    """Back up ``source`` incrementally and return the new snapshot's manifest.
+
+    Files whose size and modification time match the previous snapshot reuse its
+    chunk list without being read; changed files are re-chunked and only chunks
+    the repository doesn't already hold are written.
+    """
+    snapshots = list_snapshots(backup_root)
+    previous = load_manifest(backup_root, snapshots[-1])["files"] if snapshots else {}
+
+    files = {}
+    stats = {"files": 0, "unchanged": 0, "chunks_written": 0, "bytes_written": 0}
+    for root, dirs, names in os.walk(source):
+        dirs[:] = [name for name in dirs if name != INDEX_DIR]  # Derived data, rebuilt from the entries
+        for name in names:
+            path = os.path.join(root, name)
+            relpath = os.path.relpath(path, source).replace(os.sep, "/")
+            info = os.stat(path)
+            stats["files"] += 1
+
+            old = previous.get(relpath)
+            if old and old["size"] == info.st_size and old["mtime_ns"] == info.st_mtime_ns:
+                files[relpath] = old
+                stats["unchanged"] += 1
+                continue
+
+            chunks = []
+            with open(path, "rb") as f:
+                while True:
+                    data = f.read(CHUNK_SIZE)
+                    if not data:
+                        break
+                    digest, stored = store_chunk(backup_root, data)
+                    chunks.append(digest)
+                    if stored:
+                        stats["chunks_written"] += 1
+                        stats["bytes_written"] += len(data)
+            files[relpath] = {"size": info.st_size, "mtime_ns": info.st_mtime_ns, "chunks": chunks}
+
+    snapshot_id = datetime.now().strftime(SNAPSHOT_ID_FORMAT)
+    manifest = {
+        "id": snapshot_id,
+        "created": time.time(),
+        "source": os.path.abspath(source),
+        "files": files,
+        "stats": stats,
+    }
+    folder = os.path.join(backup_root, SNAPSHOT_DIR)
+    os.makedirs(folder, exist_ok=True)
+    tmp_path = os.path.join(folder, f"{snapshot_id}.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(tmp_path, os.path.join(folder, f"{snapshot_id}.json"))  # A snapshot only exists once complete
+    return manifest
+
+
+def snapshot_at(backup_root, when):
+    """Return the id of the latest snapshot taken at or before ``when`` (a datetime)."""
+    cutoff = when.strftime(SNAPSHOT_ID_FORMAT)
+    candidates = [s for s in list_snapshots(backup_root) if s <= cutoff]
+    if not candidates:
+        raise ValueError(f"No snapshot exists at or before {when}")
+    return candidates[-1]
+
+
+def restore_user(user_id, snapshot_id, target=JOURNAL_ROOT, backup_root=BACKUP_ROOT):
+    """Restore one user's folder as it was in the given snapshot. Returns the number of files restored.
+
+    Files the user created after the snapshot are removed so the folder matches it exactly.
+    """
+    manifest = load_manifest(backup_root, snapshot_id)
+    prefix = f"{user_id}/"
+    files = {path: meta for path, meta in manifest["files"].items() if path.startswith(prefix)}
+    if not files:
+        raise ValueError(f"Snapshot {snapshot_id} has no files for user {user_id}")
+
+    for relpath, meta in files.items():
+        path = os.path.join(target, *relpath.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.restore"
+        with open(tmp_path, "wb") as f:
+            for digest in meta["chunks"]:
+                with open(chunk_path(backup_root, digest), "rb") as chunk:
+                    f.write(decompress(chunk.read()))
+        os.replace(tmp_path, path)
+
+    user_folder = os.path.join(target, user_id)
+    for root, dirs, names in os.walk(user_folder):
+        dirs[:] = [name for name in dirs if name != INDEX_DIR]  # Brought up to date by its next sync
+        for name in names:
+            path = os.path.join(root, name)
+            relpath = os.path.relpath(path, target).replace(os.sep, "/")
+            if relpath not in files:
+                os.remove(path)
+    return len(files)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental, deduplicated backups of the journal folder.")
+    parser.add_argument("--repo", default=BACKUP_ROOT, help="Backup repository folder")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    snapshot_parser = commands.add_parser("snapshot", help="Take a new snapshot")
+    snapshot_parser.add_argument("--source", default=JOURNAL_ROOT)
+
+    commands.add_parser("list", help="List snapshots")
+
+    restore_parser = commands.add_parser("restore", help="Restore one user's journal")
+    restore_parser.add_argument("user_id")
+    restore_parser.add_argument("--snapshot", help="Snapshot id (defaults to the latest)")
+    restore_parser.add_argument("--at", help="Restore the latest snapshot at or before 'YYYY-MM-DD HH:MM'")
+    restore_parser.add_argument("--target", default=JOURNAL_ROOT)
+    args = parser.parse_args()
+
+    if args.command == "snapshot":
+        started = time.perf_counter()
+        manifest = create_snapshot(args.source, args.repo)
+        stats = manifest["stats"]
+        print(f"Snapshot {manifest['id']}: {stats['files']} files, {stats['unchanged']} unchanged, "
+              f"{stats['chunks_written']} new chunks ({stats['bytes_written']} bytes) "
+              f"in {time.perf_counter() - started:.2f}s")
+    elif args.command == "list":
+        for snapshot_id in list_snapshots(args.repo):
+            manifest = load_manifest(args.repo, snapshot_id)
+            created = datetime.fromtimestamp(manifest["created"]).strftime("%Y-%m-%d %H:%M:%S")
+            print(f"{snapshot_id}  {created}  {len(manifest['files'])} files")
+    else:
+        try:
+            if args.at:
+                snapshot_id = snapshot_at(args.repo, datetime.strptime(args.at, "%Y-%m-%d %H:%M"))
+            else:
+                snapshots = list_snapshots(args.repo)
+                if not snapshots:
+                    raise ValueError("No snapshots found")
+                snapshot_id = args.snapshot or snapshots[-1]
+            count = restore_user(args.user_id, snapshot_id, args.target, args.repo)
+        except (ValueError, FileNotFoundError) as e:
+            parser.error(str(e))
+        print(f"Restored {count} files for {args.user_id} from snapshot {snapshot_id}")
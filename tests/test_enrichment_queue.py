@@ -0,0 +1,41 @@
+import pytest
+
+import enrichment_queue
+
+
+@pytest.fixture(autouse=True)
+def queue_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(enrichment_queue, "ENRICHMENT_DIR", str(tmp_path))
+
+
+def records(count):
+    return [{"id": f"entry-{number}", "content_hash": f"{number:02}" * 32} for number in range(count)]
+
+
+def fail(name, job):
+    for _ in range(enrichment_queue.MAX_ATTEMPTS):
+        enrichment_queue._retry(name, job, "no usable answer")
+
+
+def test_failed_jobs_are_not_queued_again_until_retried():
+    assert enrichment_queue.enqueue("user", records(5)) == 5
+    for name, job in enrichment_queue.pending_jobs():
+        fail(name, job)
+    assert enrichment_queue.pending_jobs() == []
+    assert len(enrichment_queue.failed_jobs("user")) == 5
+
+    assert enrichment_queue.enqueue("user", records(6)) == 1  # Only the new entry
+
+    assert enrichment_queue.retry_failed("user") == 5
+    assert enrichment_queue.failed_jobs() == []
+    assert all(job["attempts"] == 0 for _, job in enrichment_queue.pending_jobs())
+    assert len(enrichment_queue.pending_jobs()) == 6
+
+
+def test_retry_failed_only_touches_the_given_user():
+    enrichment_queue.enqueue("user", records(1))
+    enrichment_queue.enqueue("other", [{"id": "entry-x", "content_hash": "ff" * 32}])
+    for name, job in enrichment_queue.pending_jobs():
+        fail(name, job)
+    assert enrichment_queue.retry_failed("other") == 1
+    assert [job["user_folder"] for _, job in enrichment_queue.failed_jobs()] == ["user"]
@@ -0,0 +1,31 @@
+import os
+import threading
+
+import entry_store
+
+
+def test_concurrent_writers_of_the_same_text_store_one_blob(tmp_path):
+    content = "Grateful for a slow breakfast and a long call with my sister. " * 50
+    barrier = threading.Barrier(16)
+    digests, errors = [], []
+
+    def write():
+        barrier.wait()
+        try:
+            digests.append(entry_store.write_blob(str(tmp_path), content))
+        except OSError as e:
+            errors.append(e)
+
+    for _ in range(20):
+        entry_store.read_blob.cache_clear()
+        for root, _, files in os.walk(tmp_path):
+            for name in files:
+                os.remove(os.path.join(root, name))
+        threads = [threading.Thread(target=write) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        assert entry_store.read_blob(str(tmp_path), digests[-1]) == content
+        assert os.listdir(os.path.dirname(entry_store.blob_path(str(tmp_path), digests[-1]))) == [digests[-1]]
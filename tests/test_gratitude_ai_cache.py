@@ -0,0 +1,54 @@
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import ollama_client
+import response_cache
+from ollama_standin import StandinSettings, serve
+
+PAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pages", "gratitude_ai.py")
+
+
+@pytest.fixture
+def page(tmp_path, monkeypatch):
+    """The Gratitude AI page, logged in, answering from a stand-in server in an empty working directory."""
+    server = serve(0, settings=StandinSettings(tokens_per_second=500.0, latency=0.0, max_tokens=12), background=True)
+    monkeypatch.setattr(ollama_client, "endpoints", [ollama_client.Endpoint(f"http://127.0.0.1:{server.server_address[1]}")])
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(response_cache, "REPLAY_DELAY", 0)
+    app = AppTest.from_file(PAGE, default_timeout=30)
+    app.session_state["logged_in"] = True
+    app.session_state["user_id"] = "tester"
+    app.run()
+    yield app
+    server.shutdown()
+    server.server_close()
+
+
+def ask(app, question):
+    app.text_input(key="ai_input").input(question).run()
+    assert not app.exception
+    return app.session_state["chat_history"][-1]["bot"]
+
+
+def test_repeated_question_is_answered_from_the_cache_mid_conversation(page):
+    app = page
+    hits = response_cache.stats()["hits"]
+    first = ask(app, "What is box breathing?")
+    ask(app, "I felt tense at work today.")  # From here on the conversation is sent as context
+
+    assert ask(app, "what is box breathing") == first
+    assert response_cache.stats()["hits"] == hits + 1
+
+
+def test_answers_given_with_context_are_not_cached(page):
+    app = page
+    ask(app, "I felt tense at work today.")
+    cached = response_cache.stats()["entries"]
+    ask(app, "How can I let it go?")
+    hits = response_cache.stats()["hits"]
+
+    ask(app, "how can I let it go")
+    assert response_cache.stats()["entries"] == cached
+    assert response_cache.stats()["hits"] == hits
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+import journal_index
+import ollama_client
+from entry_store import METADATA_FILE
+from ollama_standin import serve
+
+
+@pytest.fixture
+def standin(monkeypatch):
+    """A stand-in server for the embeddings; its vectors are bags of words, so shared words score high."""
+    server = serve(0, background=True)
+    monkeypatch.setattr(ollama_client, "endpoints", [ollama_client.Endpoint(f"http://127.0.0.1:{server.server_address[1]}")])
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_legacy_entries_are_retrieved_from_their_inline_text(standin, tmp_path):
+    # Saved before the blob store existed: the text is inline and there is no content hash
+    records = [
+        {"id": "walk", "title": "Morning walk", "timestamp": "2024-03-01 08-00-00",
+         "content": "A quiet walk by the river with the dog at sunrise"},
+        {"id": "work", "title": "Deadline", "timestamp": "2024-03-02 18-00-00",
+         "content": "Spreadsheets and meetings until late"},
+    ]
+    (tmp_path / METADATA_FILE).write_text(json.dumps(records))
+    assert journal_index.sync(str(tmp_path)) == (2, 0)
+
+    context = journal_index.retrieve(str(tmp_path), "a quiet walk by the river at sunrise", k=1)
+    assert '"Morning walk": A quiet walk by the river with the dog at sunrise' in context
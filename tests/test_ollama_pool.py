@@ -0,0 +1,108 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import ollama_client
+from ollama_standin import StandinSettings, serve
+
+
+class TrackingSettings(StandinSettings):
+    """Stand-in settings that also track how many generations a server runs at once."""
+
+    def __init__(self):
+        super().__init__(tokens_per_second=200.0, latency=0.05, max_tokens=10)
+        self.running = 0
+        self.peak = 0
+
+    def count(self, stat, amount=1):
+        super().count(stat, amount)
+        with self.lock:
+            if stat == "requests":
+                self.running += 1
+                self.peak = max(self.peak, self.running)
+            elif stat == "tokens":  # A non-streaming answer is counted once, right before it is sent
+                self.running -= 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Two stand-in servers in place of the configured pool, restored after the test."""
+    servers = [serve(0, settings=TrackingSettings(), background=True) for _ in range(2)]
+    pooled = [ollama_client.Endpoint(f"http://127.0.0.1:{server.server_address[1]}") for server in servers]
+    monkeypatch.setattr(ollama_client, "endpoints", pooled)
+    # Health checks would keep running against the stand-ins after they shut down
+    monkeypatch.setattr(ollama_client, "_health_checker", threading.current_thread())
+    yield servers, pooled
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def ask(count):
+    with ThreadPoolExecutor(count) as executor:
+        return list(executor.map(lambda number: ollama_client.generate(
+            {"model": "standin", "prompt": f"question {number}"}), range(count)))
+
+
+def test_load_is_spread_over_both_servers(pool):
+    servers, pooled = pool
+    answers = ask(8)
+    assert all(answer["done"] for answer in answers)
+    served = [server.RequestHandlerClass.settings.stats["requests"] for server in servers]
+    assert served == [4, 4]
+    assert [endpoint.in_flight for endpoint in pooled] == [0, 0]
+
+
+def test_requests_fail_over_when_a_server_goes_down(pool):
+    servers, pooled = pool
+    servers[1].shutdown()
+    servers[1].server_close()
+    answers = ask(3 * ollama_client.MAX_CONCURRENT_REQUESTS)
+    assert all(answer["done"] for answer in answers)
+    assert not pooled[1].healthy
+    survivor = servers[0].RequestHandlerClass.settings
+    assert survivor.stats["requests"] == len(answers)
+    # The survivor takes all the work, but no more of it at once than its own limit
+    assert survivor.peak <= ollama_client.MAX_CONCURRENT_REQUESTS
+
+
+def test_requests_fail_over_on_server_errors(pool):
+    servers, pooled = pool
+    servers[1].RequestHandlerClass.settings.error_rate = 1.0  # Every request gets an HTTP 500
+    answers = ask(4)
+    streamed = list(ollama_client.stream_generate({"model": "standin", "prompt": "streamed question"}))
+    assert all(answer["done"] for answer in answers) and streamed[-1]["done"]
+    assert not pooled[1].healthy
+    assert "500" in pooled[1].last_error
+    assert servers[0].RequestHandlerClass.settings.stats["requests"] == 5
+
+
+def test_client_errors_are_not_failed_over(pool):
+    servers, pooled = pool
+    with pytest.raises(ollama_client.requests.exceptions.HTTPError):
+        ollama_client._post({"model": "standin"}, "/api/missing")  # The stand-in answers 404
+    assert all(endpoint.healthy for endpoint in pooled)
+    assert sum(endpoint.served for endpoint in pooled) == 1  # Not retried on the other server
+
+
+def test_explicit_url_counts_towards_its_pooled_endpoint(pool):
+    servers, pooled = pool
+    started = threading.Event()
+    release = threading.Event()
+    original = servers[0].RequestHandlerClass.settings.count
+
+    def count(stat, amount=1):
+        original(stat, amount)
+        if stat == "requests":
+            started.set()
+            release.wait(5)
+
+    servers[0].RequestHandlerClass.settings.count = count
+    worker = threading.Thread(target=ollama_client.warm_up, args=("standin", pooled[0].generate_url))
+    worker.start()
+    assert started.wait(5)
+    assert pooled[0].in_flight == 1
+    release.set()
+    worker.join(5)
+    assert pooled[0].in_flight == 0
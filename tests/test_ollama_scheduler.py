@@ -0,0 +1,136 @@
+import time
+import threading
+
+import pytest
+
+import ollama_client
+import ollama_scheduler
+from ollama_standin import StandinSettings, serve
+
+
+class Held:
+    """Stands in for the scheduler's ``stream_generate``: records which prompts start, in order,
+    and keeps a worker busy on a "hold ..." prompt until that prompt is released."""
+
+    def __init__(self):
+        self.started = []
+        self.holds = {}
+        self.lock = threading.Condition()
+
+    def __call__(self, payload, url=None):
+        with self.lock:
+            self.started.append(payload["prompt"])
+            self.lock.notify_all()
+        if payload["prompt"] in self.holds:
+            self.holds[payload["prompt"]].wait(10)
+        return ollama_client.stream_generate(payload, url)
+
+    def wait_started(self, count):
+        with self.lock:
+            assert self.lock.wait_for(lambda: len(self.started) >= count, 10)
+
+    def occupy_workers(self):
+        """Keep every scheduler worker busy, so new generations queue up; returns their iterators."""
+        prompts = [f"hold {number}" for number in range(ollama_scheduler.MAX_IN_FLIGHT)]
+        for prompt in prompts:
+            self.holds[prompt] = threading.Event()
+        followers = [ollama_scheduler.submit("holder", payload(prompt)) for prompt in prompts]
+        self.wait_started(len(prompts))
+        return followers
+
+    def release(self, count=None):
+        for event in list(self.holds.values())[:count]:
+            event.set()
+
+
+def payload(prompt):
+    return {"model": "standin", "prompt": prompt}
+
+
+def text(follower):
+    return "".join(chunk.get("response", "") for chunk in follower)
+
+
+def eventually(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def held(monkeypatch):
+    server = serve(0, settings=StandinSettings(tokens_per_second=1000.0, latency=0.0, max_tokens=5), background=True)
+    monkeypatch.setattr(ollama_client, "endpoints", [ollama_client.Endpoint(f"http://127.0.0.1:{server.server_address[1]}")])
+    held = Held()
+    held.settings = server.RequestHandlerClass.settings
+    monkeypatch.setattr(ollama_scheduler, "stream_generate", held)
+    yield held
+    held.release()
+    server.shutdown()
+    server.server_close()
+
+
+def test_users_are_served_round_robin(held):
+    holders = held.occupy_workers()
+    followers = {prompt: ollama_scheduler.submit(user_id, payload(prompt))
+                 for user_id, prompt in [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1"), ("b", "b2")]}
+    assert ollama_scheduler.queue_depth() == 5
+    assert ollama_scheduler.active() == 5 + len(holders)
+
+    held.release(1)  # One worker works through the queue on its own, in the order the scheduler picks
+    held.wait_started(len(holders) + 5)
+    assert held.started[len(holders):] == ["a1", "b1", "a2", "b2", "a3"]
+    held.release()
+    assert all(text(follower) for follower in list(followers.values()) + holders)
+    assert ollama_scheduler.active() == 0
+
+
+def test_identical_prompts_share_one_generation(held):
+    holders = held.occupy_workers()
+    first = ollama_scheduler.submit("a", payload("How do I breathe mindfully?"))
+    second = ollama_scheduler.submit("b", payload("How do I breathe mindfully?"))
+    assert ollama_scheduler.queue_depth() == 1
+
+    held.release()
+    assert text(first) == text(second) != ""
+    assert held.started.count("How do I breathe mindfully?") == 1
+    assert all(text(follower) for follower in holders)
+
+
+def test_closing_a_running_generation_closes_its_stream(held):
+    held.settings.tokens_per_second = 20.0
+    held.settings.max_tokens = 200  # Ten seconds of answer
+    follower = ollama_scheduler.submit("a", payload("Tell me a long story"), poll_interval=0.05)
+    assert next(chunk for chunk in follower if chunk.get("response"))
+    follower.close()
+
+    eventually(lambda: held.settings.stats["cancelled"] == 1)
+    assert held.settings.stats["tokens"] < 200
+    eventually(lambda: ollama_scheduler.active() == 0)
+
+
+def test_closing_a_queued_generation_drops_it(held):
+    holders = held.occupy_workers()
+    follower = ollama_scheduler.submit("a", payload("Never mind"), poll_interval=0.05)
+    assert next(follower) == {"waiting": True, "ahead": 0}
+    follower.close()
+    assert ollama_scheduler.queue_depth() == 0
+
+    held.release()
+    assert all(text(follower) for follower in holders)
+    assert "Never mind" not in held.started
+
+
+def test_full_queue_turns_new_prompts_away(held, monkeypatch):
+    holders = held.occupy_workers()
+    monkeypatch.setattr(ollama_scheduler, "MAX_QUEUE_DEPTH", 2)
+    queued = [ollama_scheduler.submit("a", payload("first")), ollama_scheduler.submit("b", payload("second"))]
+    with pytest.raises(ollama_scheduler.SchedulerBusy) as busy:
+        ollama_scheduler.submit("c", payload("third"))
+    assert busy.value.depth == 2
+    queued.append(ollama_scheduler.submit("c", payload("second")))  # Joins the queued one instead
+
+    held.release()
+    assert all(text(follower) for follower in queued + holders)
+    assert "third" not in held.started